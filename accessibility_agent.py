@@ -1,14 +1,126 @@
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from typing import Dict, List
+from datetime import datetime
+from urllib.parse import urldefrag, urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+from image_probe import ImageProbe, classify_image
+from memory_budget import MemoryBudget
+from profiler import profile_audit
+from scoring_policy import detect_site_type, evaluate, get_policy, policy_id
+from template_cache import (
+    ISSUE_TOTAL_STATS, TemplateCache, find_template_regions, fingerprint, issue_details, region_name,
+)
+
+# Statistics collected by the checks, with their initial values
+DEFAULT_STATS = {
+    'total_images': 0,
+    'images_without_alt': 0,
+    'total_links': 0,
+    'unclear_links': 0,
+    'has_lang': False,
+    'h1_count': 0,
+    'total_forms': 0,
+    'forms_without_labels': 0,
+    'total_buttons': 0,
+    'buttons_without_text': 0,
+    'total_tables': 0,
+    'tables_without_headers': 0,
+    'elements_checked_for_contrast': 0,
+    'low_contrast_elements': 0,
+    'decorative_images': 0,
+    'frames_audited': 0,
+    'template_regions': 0,
+    'template_regions_reused': 0,
+}
+
+# Add realistic browser headers to avoid 403 Forbidden errors
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'he-IL,he;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0'
+}
+
+# Frames fetched in parallel, which is also the session's pool size per host
+FRAME_WORKERS = 4
+
+# Second-level labels under country TLDs that act as public suffixes (co.il, gov.uk...)
+COUNTRY_SECOND_LEVEL = {'co', 'com', 'org', 'net', 'gov', 'ac', 'edu', 'muni', 'idf'}
+
+# Findings about the page as a whole - meaningless for a widget inside a frame
+PAGE_LEVEL_ISSUES = {'Missing h1', 'Multiple h1', 'Skipped heading level', 'Missing ARIA landmarks',
+                     'Missing skip link', 'Color contrast check limited'}
+
+# Element counts, which add up across the page, its frames and its template regions
+ELEMENT_STATS = ['total_images', 'images_without_alt', 'decorative_images', 'total_links', 'unclear_links',
+                 'total_forms', 'forms_without_labels', 'total_buttons', 'buttons_without_text',
+                 'total_tables', 'tables_without_headers']
+
+
+# Checks that judge the page as a whole rather than individual elements
+PAGE_CHECKS = {'check_lang_attribute', 'check_headings_hierarchy', 'check_aria_landmarks',
+               'check_skip_links', 'check_color_contrast'}
+
+
+def absolute_url(base: str, src: str):
+    """Resolve src against base, or None if src is not a valid URL (e.g. http://[abc/x.png)"""
+    try:
+        return urljoin(base, src)
+    except ValueError:
+        return None
+
+
+def site_of(host: str) -> str:
+    """Registrable site of a host name, e.g. pay.bank.co.il -> bank.co.il"""
+    # IP addresses have no parent site
+    if re.fullmatch(r'[\d.]+|[0-9a-fA-F:]+', host):
+        return host
+    
+    labels = host.lower().split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in COUNTRY_SECOND_LEVEL:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
 class AccessibilityAgent:
     """Agent for checking website accessibility"""
     
-    def __init__(self, url: str):
+    def __init__(self, url: str, image_probe: ImageProbe = None, policy: dict = None,
+                 session: requests.Session = None, max_frames: int = 0, max_frame_depth: int = 1,
+                 frame_hosts: List[str] = None, template_cache: TemplateCache = None):
         self.url = url
+        # Findings of header/nav/footer regions shared by the site's pages
+        self.template_cache = template_cache
+        # Shared by the page and its frames, so frame fetches reuse pooled connections
+        self.session = session or self.create_session()
+        # Iframe auditing: off when max_frames is 0; frame_hosts allows extra cross-site hosts
+        self.max_frames = max_frames
+        self.max_frame_depth = max_frame_depth
+        self.frame_hosts = [host.lower() for host in frame_hosts or []]
+        self.frames = []
+        # Scoring policy deciding the required and achieved WCAG levels
+        self.policy = policy or get_policy()
         self.soup = None
+        # Optional probe used to tell decorative images from content images
+        self.image_probe = image_probe
+        # Memory report, set when running with a memory budget
+        self.memory = None
+        # iframe sources of the page, collected before template regions are removed
+        self.frame_sources = None
+        # Ids that a <label for> of the page points to, likewise collected up front
+        self.label_targets = None
         self.issues = {
             'critical': [],
             'high': [],
@@ -16,110 +128,70 @@ class AccessibilityAgent:
             'low': []
         }
         # Statistics for WCAG calculation
-        self.stats = {
-            'total_images': 0,
-            'images_without_alt': 0,
-            'total_links': 0,
-            'unclear_links': 0,
-            'has_lang': False,
-            'h1_count': 0,
-            'total_forms': 0,
-            'forms_without_labels': 0,
-            'total_buttons': 0,
-            'buttons_without_text': 0,
-            'total_tables': 0,
-            'tables_without_headers': 0,
-            'elements_checked_for_contrast': 0,
-            'low_contrast_elements': 0,
-        }
+        self.stats = dict(DEFAULT_STATS)
     
     def detect_required_level(self):
         """Detect the required WCAG level based on website type"""
-        url_lower = self.url.lower()
-        
-        # Government sites - AAA required
-        if any(domain in url_lower for domain in ['.gov.', 'gov.il', 'משרד', 'ממשלת', 'government']):
-            return {
-                'required_level': 'level_aaa',
-                'site_type': 'ממשלתי',
-                'reason': 'אתרי ממשל נדרשים לעמוד ברמת נגישות מקסימלית (AAA)'
-            }
-        
-        # Banking and financial sites - AA required
-        elif any(domain in url_lower for domain in ['bank', 'בנק', 'leumi', 'hapoalim', 'mizrahi', 'discount', 'finance']):
-            return {
-                'required_level': 'level_aa',
-                'site_type': 'בנקאות ופיננסים',
-                'reason': 'אתרי בנקאות ופיננסים נדרשים לעמוד בתקן AA'
-            }
-        
-        # Public services and health - AA required
-        elif any(domain in url_lower for domain in ['health', 'בריאות', 'hospital', 'clinic', 'education', 'חינוך', 'university', 'אוניברסיטה']):
-            return {
-                'required_level': 'level_aa',
-                'site_type': 'שירות ציבורי',
-                'reason': 'שירותי בריאות וחינוך נדרשים לעמוד בתקן AA'
-            }
+        site_type = detect_site_type(self.policy, self.url)
         
-        # E-commerce - A required
-        elif any(domain in url_lower for domain in ['shop', 'store', 'cart', 'buy', 'קנייה']):
-            return {
-                'required_level': 'level_a',
-                'site_type': 'מסחר אלקטרוני',
-                'reason': 'אתרי מסחר מומלצים לעמוד לפחות ברמה A'
-            }
-        
-        # Default - A recommended
-        else:
-            return {
-                'required_level': 'level_a',
-                'site_type': 'כללי',
-                'reason': 'מומלץ לעמוד לפחות ברמת נגישות בסיסית (A)'
-            }
-
+        return {
+            'required_level': site_type['required_level'],
+            'site_type': site_type['site_type'],
+            'reason': site_type['reason']
+        }
     
     def fetch_page(self):
         """Navigate to page and fetch HTML"""
         try:
             print(f"Fetching page: {self.url}")
-            
-            # Add realistic browser headers to avoid 403 Forbidden errors
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'he-IL,he;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0'
-            }
-            
-            response = requests.get(self.url, timeout=10, headers=headers)
-            response.raise_for_status()
-            self.soup = BeautifulSoup(response.content, 'lxml')
+            self.soup = self.fetch_document(self.url)
             print("Page loaded successfully!")
             return True
         except Exception as e:
             print(f"Error loading page: {e}")
             return False
     
+    def fetch_document(self, url: str):
+        """Fetch and parse an HTML document through the agent's session"""
+        response = self.session.get(url, timeout=10, headers=BROWSER_HEADERS)
+        response.raise_for_status()
+        return BeautifulSoup(response.content, 'lxml')
+    
     def check_images_alt_text(self):
         """Check alt text for images"""
         print("\nChecking images alt text...")
         images = self.soup.find_all('img')
         images_without_alt = []
+        decorative_without_empty_alt = []
+        decorative_count = 0
+        
+        # Only images lacking alt text need to be told apart
+        probed = {}
+        if self.image_probe:
+            probe_urls = [absolute_url(self.url, img['src']) for img in images if not img.get('alt') and img.get('src')]
+            # Malformed sources can't be probed and stay 'unknown'
+            probed = self.image_probe.probe_all([url for url in probe_urls if url])
+            print(f"   Probed {len(probed)} images without alt text")
         
         for img in images:
             if not img.get('alt'):
-                images_without_alt.append(img.get('src', 'unknown'))
+                src = img.get('src')
+                
+                if self.image_probe:
+                    info = probed.get(absolute_url(self.url, src)) if src else None
+                    if classify_image(img, info) == 'decorative':
+                        decorative_count += 1
+                        # Decorative images should have an empty alt so screen readers skip them
+                        if img.get('alt') is None:
+                            decorative_without_empty_alt.append(src or 'unknown')
+                        continue
+                
+                images_without_alt.append(src or 'unknown')
         
         # Update statistics
-        self.stats['total_images'] = len(images)
-        self.stats['images_without_alt'] = len(images_without_alt)
+        self.stats['total_images'] += len(images)
+        self.stats['images_without_alt'] += len(images_without_alt)
+        self.stats['decorative_images'] += decorative_count
         
         if images_without_alt:
             self.issues['high'].append({
@@ -129,8 +201,18 @@ class AccessibilityAgent:
                 'examples': images_without_alt[:3]
             })
         
+        if decorative_without_empty_alt:
+            self.issues['low'].append({
+                'type': 'Decorative images without empty alt',
+                'count': len(decorative_without_empty_alt),
+                'details': f"Found {len(decorative_without_empty_alt)} decorative images (tracking pixels, spacers) without alt=\"\"",
+                'examples': decorative_without_empty_alt[:3]
+            })
+        
         print(f"   Checked {len(images)} images")
         print(f"   {len(images_without_alt)} images without alt text")
+        if self.image_probe:
+            print(f"   {decorative_count} decorative images")
     
     def check_headings_hierarchy(self):
         """Check headings hierarchy"""
@@ -210,8 +292,8 @@ class AccessibilityAgent:
                 problematic_links.append(f"{text} -> {link.get('href', '')}")
         
         # Update statistics
-        self.stats['total_links'] = len(links)
-        self.stats['unclear_links'] = len(problematic_links)
+        self.stats['total_links'] += len(links)
+        self.stats['unclear_links'] += len(problematic_links)
         
         if problematic_links:
             self.issues['medium'].append({
@@ -230,6 +312,11 @@ class AccessibilityAgent:
         inputs = self.soup.find_all(['input', 'textarea', 'select'])
         inputs_without_labels = []
         
+        # Labels may sit outside the part of the page being checked (e.g. a template region)
+        label_targets = self.label_targets
+        if label_targets is None:
+            label_targets = {label['for'] for label in self.soup.find_all('label', attrs={'for': True})}
+        
         for inp in inputs:
             input_type = inp.get('type', 'text')
             # Skip hidden and submit buttons
@@ -242,10 +329,8 @@ class AccessibilityAgent:
             aria_labelledby = inp.get('aria-labelledby')
             
             # Check for label element
-            if input_id:
-                label = self.soup.find('label', {'for': input_id})
-                if label:
-                    has_label = True
+            if input_id and input_id in label_targets:
+                has_label = True
             
             # Check for ARIA labels
             if aria_label or aria_labelledby:
@@ -258,8 +343,8 @@ class AccessibilityAgent:
             if not has_label:
                 inputs_without_labels.append(f"{inp.name} type='{input_type}'")
         
-        self.stats['total_forms'] = len(inputs)
-        self.stats['forms_without_labels'] = len(inputs_without_labels)
+        self.stats['total_forms'] += len(inputs)
+        self.stats['forms_without_labels'] += len(inputs_without_labels)
         
         if inputs_without_labels:
             self.issues['high'].append({
@@ -287,10 +372,11 @@ class AccessibilityAgent:
             aria_label = btn.get('aria-label', '')
             
             if not text and not value and not aria_label:
-                buttons_without_text.append(str(btn)[:100])
+                buttons_without_text.append(self.element_snippet(btn))
         
-        self.stats['total_buttons'] = len([b for b in buttons if b.name == 'button' or (b.name == 'input' and b.get('type') in ['button', 'submit', 'reset'])])
-        self.stats['buttons_without_text'] = len(buttons_without_text)
+        button_count = len([b for b in buttons if b.name == 'button' or (b.name == 'input' and b.get('type') in ['button', 'submit', 'reset'])])
+        self.stats['total_buttons'] += button_count
+        self.stats['buttons_without_text'] += len(buttons_without_text)
         
         if buttons_without_text:
             self.issues['high'].append({
@@ -300,7 +386,7 @@ class AccessibilityAgent:
                 'examples': buttons_without_text[:3]
             })
         
-        print(f"   Checked {self.stats['total_buttons']} buttons")
+        print(f"   Checked {button_count} buttons")
         print(f"   {len(buttons_without_text)} buttons without text")
     
     def check_tables(self):
@@ -324,10 +410,10 @@ class AccessibilityAgent:
                         break
             
             if not has_headers:
-                tables_without_headers.append(str(table)[:100])
+                tables_without_headers.append(self.element_snippet(table))
         
-        self.stats['total_tables'] = len(tables)
-        self.stats['tables_without_headers'] = len(tables_without_headers)
+        self.stats['total_tables'] += len(tables)
+        self.stats['tables_without_headers'] += len(tables_without_headers)
         
         if tables_without_headers:
             self.issues['medium'].append({
@@ -388,6 +474,224 @@ class AccessibilityAgent:
         else:
             print("   Skip link found")
     
+    @staticmethod
+    def create_session():
+        """HTTP session with a connection pool big enough for parallel frame fetches"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=FRAME_WORKERS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def frame_allowed(self, url: str):
+        """Same-site frames are always audited; cross-site ones only if configured"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return False
+        
+        host = parts.hostname.lower()
+        if site_of(host) == site_of(urlsplit(self.url).hostname or ''):
+            return True
+        return any(host == allowed or host.endswith('.' + allowed) for allowed in self.frame_hosts)
+    
+    def fetch_frame(self, url: str):
+        """Fetch a frame document, returning None if it can't be loaded"""
+        try:
+            return self.fetch_document(url)
+        except Exception as e:
+            print(f"   Error loading frame {url}: {e}")
+            return None
+    
+    def check_iframes(self):
+        """Audit iframes with the same checks and merge their findings"""
+        print("\nChecking iframes...")
+        seen = {self.url}
+        # Documents whose iframes are audited next, one nesting level at a time
+        level = [(self.soup, self.url)]
+        
+        for depth in range(1, self.max_frame_depth + 1):
+            frame_urls = []
+            for soup, base_url in level:
+                if soup is self.soup and self.frame_sources is not None:
+                    sources = self.frame_sources
+                else:
+                    sources = [iframe['src'] for iframe in soup.find_all('iframe', src=True)]
+                
+                for src in sources:
+                    url = absolute_url(base_url, src)
+                    # Malformed sources can't be fetched
+                    if url is None:
+                        continue
+                    url = urldefrag(url)[0]
+                    if url in seen or not self.frame_allowed(url):
+                        continue
+                    if len(self.frames) + len(frame_urls) >= self.max_frames:
+                        break
+                    seen.add(url)
+                    frame_urls.append(url)
+            
+            # Parent documents are done once their iframes are known
+            for soup, _ in level:
+                if soup is not self.soup:
+                    soup.decompose()
+            level = []
+            
+            if not frame_urls:
+                break
+            
+            with ThreadPoolExecutor(max_workers=min(FRAME_WORKERS, len(frame_urls))) as executor:
+                documents = list(executor.map(self.fetch_frame, frame_urls))
+            
+            for url, soup in zip(frame_urls, documents):
+                if soup is None:
+                    continue
+                
+                frame_agent = AccessibilityAgent(url, image_probe=self.image_probe, policy=self.policy,
+                                                 session=self.session)
+                frame_agent.soup = soup
+                frame_agent.run_checks()
+                self.merge_frame(frame_agent, depth)
+                level.append((soup, url))
+        
+        for soup, _ in level:
+            soup.decompose()
+        
+        print(f"   Audited {len(self.frames)} frames")
+    
+    def merge_frame(self, frame_agent, depth: int):
+        """Merge a frame's issues and stats into this page, attributed to the frame"""
+        frame_issues = 0
+        for priority, issues in frame_agent.issues.items():
+            for issue in issues:
+                if issue['type'] in PAGE_LEVEL_ISSUES:
+                    continue
+                self.issues[priority].append({**issue, 'frame': frame_agent.url})
+                frame_issues += 1
+        
+        for key in ELEMENT_STATS:
+            self.stats[key] += frame_agent.stats[key]
+        self.stats['frames_audited'] += 1
+        
+        self.frames.append({
+            'url': frame_agent.url,
+            'depth': depth,
+            'issues': frame_issues
+        })
+    
+    def check_templates(self):
+        """Check template regions once per site and remove them from the page"""
+        print("\nChecking template regions...")
+        site = site_of(urlsplit(self.url).hostname or '')
+        regions = find_template_regions(self.soup)
+        reused = 0
+        
+        # Frames inside template regions are still audited after the regions are gone
+        if self.max_frames > 0:
+            self.frame_sources = [iframe['src'] for iframe in self.soup.find_all('iframe', src=True)]
+        
+        # A region's input may be labelled from elsewhere on the page, so the
+        # region and the rest of the page both check against the whole page's labels
+        self.label_targets = {label['for'] for label in self.soup.find_all('label', attrs={'for': True})}
+        
+        for region in regions:
+            # Which of the region's inputs are labelled from outside differs between pages
+            labelled = sorted(element['id'] for element in region.find_all(['input', 'textarea', 'select'], id=True)
+                              if element['id'] in self.label_targets)
+            region_fingerprint = fingerprint(region, extra=labelled)
+            findings = self.template_cache.get(site, region_fingerprint)
+            
+            if findings is None:
+                findings = self.check_region(region)
+                self.template_cache.put(site, region_fingerprint, findings)
+            else:
+                reused += 1
+            
+            for priority, issues in findings['issues'].items():
+                for issue in issues:
+                    self.issues[priority].append({**issue, 'template': region_fingerprint, 'region': region_name(region)})
+            for key in ELEMENT_STATS:
+                self.stats[key] += findings['stats'][key]
+            
+            # The element checks that follow only look at page-unique content
+            region.decompose()
+        
+        self.stats['template_regions'] = len(regions)
+        self.stats['template_regions_reused'] = reused
+        
+        print(f"   Found {len(regions)} template regions, {reused} already checked on other pages")
+    
+    def merge_template_issues(self):
+        """Fold template region issues into the page's issue of the same type.
+        
+        The page then reports each issue type once, as it would without the
+        template cache; counts add up and the regions are listed under 'templates'.
+        Runs before check_iframes, so the stats still cover just the page.
+        """
+        for priority, issues in self.issues.items():
+            merged = []
+            # The page's own issue per type - frame issues stay separate
+            page_issues = {issue['type']: issue for issue in issues if 'template' not in issue and 'frame' not in issue}
+            
+            for issue in issues:
+                if 'template' not in issue:
+                    merged.append(issue)
+                    continue
+                
+                template = {key: issue[key] for key in ('template', 'region', 'count', 'details', 'examples') if key in issue}
+                page_issue = page_issues.get(issue['type'])
+                if page_issue is None:
+                    page_issue = {key: value for key, value in issue.items() if key not in ('template', 'region')}
+                    page_issue['count'] = 0
+                    page_issues[issue['type']] = page_issue
+                    merged.append(page_issue)
+                
+                page_issue['count'] = page_issue.get('count', 0) + issue.get('count', 0)
+                page_issue.setdefault('templates', []).append(template)
+            
+            # Details describe the merged count, worded as a plain audit would
+            for issue in merged:
+                if 'templates' in issue:
+                    total_stat = ISSUE_TOTAL_STATS.get(issue['type'])
+                    issue['details'] = issue_details(issue, issue['count'],
+                                                     self.stats[total_stat] if total_stat else None)
+            
+            self.issues[priority] = merged
+    
+    def check_region(self, region):
+        """Run the element checks on a single region, returning its findings"""
+        region_agent = AccessibilityAgent(self.url, image_probe=self.image_probe, policy=self.policy,
+                                          session=self.session)
+        region_agent.soup = region
+        region_agent.label_targets = self.label_targets
+        
+        for check in region_agent.get_checks():
+            if check.__name__ not in PAGE_CHECKS:
+                check()
+        
+        return {
+            'issues': region_agent.issues,
+            'stats': {key: region_agent.stats[key] for key in ELEMENT_STATS}
+        }
+    
+    def element_snippet(self, element, limit: int = 100):
+        """Short HTML-like preview of an element.
+        
+        Unlike str(element)[:limit] this doesn't serialize the whole subtree,
+        which matters for huge tables.
+        """
+        attrs = ''.join(
+            f' {name}="{" ".join(value) if isinstance(value, list) else value}"'
+            for name, value in element.attrs.items()
+        )
+        snippet = f"<{element.name}{attrs}>"
+        
+        for text in element.stripped_strings:
+            if len(snippet) >= limit:
+                break
+            snippet += text + ' '
+        
+        return snippet[:limit].rstrip()
+    
     def hex_to_rgb(self, hex_color):
         """Convert hex color to RGB"""
         hex_color = hex_color.lstrip('#')
@@ -435,58 +739,15 @@ class AccessibilityAgent:
     
     def calculate_wcag_level(self):
         """Calculate WCAG conformance level based on criteria"""
-        critical_count = len(self.issues['critical'])
-        high_count = len(self.issues['high'])
-        medium_count = len(self.issues['medium'])
-        
-        # Calculate percentages for Level AA
-        images_without_alt_pct = 0
-        if self.stats['total_images'] > 0:
-            images_without_alt_pct = (self.stats['images_without_alt'] / self.stats['total_images']) * 100
-        
-        unclear_links_pct = 0
-        if self.stats['total_links'] > 0:
-            unclear_links_pct = (self.stats['unclear_links'] / self.stats['total_links']) * 100
-        
-        forms_without_labels_pct = 0
-        if self.stats['total_forms'] > 0:
-            forms_without_labels_pct = (self.stats['forms_without_labels'] / self.stats['total_forms']) * 100
-        
-        # Level A requirements (basic)
-        level_a_requirements = {
-            'has_lang': self.stats['has_lang'],
-            'has_h1': self.stats['h1_count'] >= 1,
-            'all_images_have_alt': self.stats['images_without_alt'] == 0,
-            'all_links_clear': self.stats['unclear_links'] == 0,
-            'all_forms_labeled': self.stats['forms_without_labels'] == 0,
-            'all_buttons_labeled': self.stats['buttons_without_text'] == 0
-        }
-        
-        # Check if meets Level A
-        meets_level_a = all(level_a_requirements.values())
-        
-        # Level AA requirements (standard)
-        level_aa_requirements = {
-            'single_h1': self.stats['h1_count'] == 1,
-            'low_alt_issues': images_without_alt_pct < 10,
-            'low_link_issues': unclear_links_pct < 5,
-            'low_form_issues': forms_without_labels_pct < 5,
-            'tables_accessible': self.stats['tables_without_headers'] == 0 or self.stats['total_tables'] == 0
-        }
-        
-        meets_level_aa = meets_level_a and all(level_aa_requirements.values())
-        
-        # Level AAA requirements (high)
-        level_aaa_requirements = {
-            'no_critical': critical_count == 0,
-            'no_high': high_count == 0,
-            'max_medium': medium_count <= 2
-        }
-        
-        meets_level_aaa = meets_level_aa and all(level_aaa_requirements.values())
+        if self.memory and self.memory['aborted']:
+            return self.incomplete_wcag_level()
+
+        issue_counts = {priority: len(issues) for priority, issues in self.issues.items()}
+        verdict = evaluate(self.policy, self.url, self.stats, issue_counts)
         
-        # Detect required level for this site
-        required_info = self.detect_required_level()
+        meets_level_a = verdict['passes']['level_a']
+        meets_level_aa = verdict['passes']['level_aa']
+        meets_level_aaa = verdict['passes']['level_aaa']
         
         # Determine actual achieved level
         if not meets_level_a:
@@ -510,35 +771,59 @@ class AccessibilityAgent:
             achieved_description = 'האתר עומד בדרישות הבסיסיות של WCAG'
             achieved_color = '#f59e0b'
         
-        # Check if meets required level
-        level_hierarchy = {'non_compliant': 0, 'level_a': 1, 'level_aa': 2, 'level_aaa': 3}
-        meets_required = level_hierarchy.get(achieved_level, 0) >= level_hierarchy.get(required_info['required_level'], 0)
-        
         return {
             'achieved_level': achieved_level,
             'achieved_label': achieved_label,
             'achieved_description': achieved_description,
             'achieved_color': achieved_color,
-            'required_level': required_info['required_level'],
-            'site_type': required_info['site_type'],
-            'required_reason': required_info['reason'],
-            'meets_required': meets_required,
-            'all_levels': {
-                'level_a': {
-                    'passes': meets_level_a,
-                    'label': 'Level A - בסיסי',
-                    'description': 'דרישות נגישות בסיסיות'
-                },
-                'level_aa': {
-                    'passes': meets_level_aa,
-                    'label': 'Level AA - תקן',
-                    'description': 'תקן נגישות מקובל'
-                },
-                'level_aaa': {
-                    'passes': meets_level_aaa,
-                    'label': 'Level AAA - מצוין',
-                    'description': 'נגישות ברמה הגבוהה ביותר'
-                }
+            'required_level': verdict['required_level'],
+            'site_type': verdict['site_type'],
+            'required_reason': verdict['reason'],
+            'meets_required': verdict['meets_required'],
+            'policy': verdict['policy'],
+            'all_levels': self.level_statuses({
+                'level_a': meets_level_a,
+                'level_aa': meets_level_aa,
+                'level_aaa': meets_level_aaa
+            })
+        }
+    
+    def incomplete_wcag_level(self):
+        """WCAG level of an audit whose checks didn't all run - no verdict is given"""
+        site_type = self.detect_required_level()
+        
+        return {
+            'achieved_level': 'incomplete',
+            'achieved_label': 'בדיקה חלקית',
+            'achieved_description': f'הבדיקה הופסקה אחרי {self.memory["aborted_at"]} (חריגה מתקציב הזיכרון) - '
+                                    'לא ניתן לקבוע רמת עמידה',
+            'achieved_color': '#6b7280',
+            'required_level': site_type['required_level'],
+            'site_type': site_type['site_type'],
+            'required_reason': site_type['reason'],
+            'meets_required': None,
+            'policy': policy_id(self.policy),
+            'all_levels': self.level_statuses({'level_a': None, 'level_aa': None, 'level_aaa': None})
+        }
+    
+    @staticmethod
+    def level_statuses(passes):
+        """Per-level status shown in the UI and PDF; passes is None when unknown"""
+        return {
+            'level_a': {
+                'passes': passes['level_a'],
+                'label': 'Level A - בסיסי',
+                'description': 'דרישות נגישות בסיסיות'
+            },
+            'level_aa': {
+                'passes': passes['level_aa'],
+                'label': 'Level AA - תקן',
+                'description': 'תקן נגישות מקובל'
+            },
+            'level_aaa': {
+                'passes': passes['level_aaa'],
+                'label': 'Level AAA - מצוין',
+                'description': 'נגישות ברמה הגבוהה ביותר'
             }
         }
 
@@ -580,6 +865,101 @@ class AccessibilityAgent:
         
         print("="*60)
     
+    def get_checks(self):
+        """Return the checks in the order they run"""
+        checks = [
+            # Basic checks
+            self.check_lang_attribute,
+            self.check_headings_hierarchy,
+            self.check_images_alt_text,
+            self.check_links_text,
+            
+            # Form and interaction checks
+            self.check_form_labels,
+            self.check_buttons,
+            self.check_tables,
+            
+            # Structure checks
+            self.check_aria_landmarks,
+            self.check_skip_links,
+            
+            # Visual checks (limited without CSS parsing)
+            self.check_color_contrast,
+        ]
+        
+        # Embedded documents
+        if self.max_frames > 0:
+            checks.append(self.check_iframes)
+        
+        # Page-wide checks still see the whole page; element checks then skip template regions
+        if self.template_cache is not None:
+            element_checks = [check for check in checks if check.__name__ not in PAGE_CHECKS | {'check_iframes'}]
+            checks = ([check for check in checks if check.__name__ in PAGE_CHECKS] + [self.check_templates] +
+                      element_checks + [self.merge_template_issues] +
+                      [check for check in checks if check.__name__ == 'check_iframes'])
+        
+        return checks
+    
+    def run_checks(self, after_check=None):
+        """Run all checks on the fetched page"""
+        for check in self.get_checks():
+            check()
+            if after_check:
+                after_check(check.__name__)
+    
+    def run_bounded_audit(self, budget_mb: float):
+        """Fetch and check the page within a memory budget, then free the DOM.
+        
+        If the budget is exceeded the remaining checks are skipped and the
+        result is marked as partial. Returns False if the page failed to load.
+        """
+        fetched = False
+        budget = MemoryBudget(budget_mb)
+        
+        with budget:
+            try:
+                fetched = self.fetch_page()
+                if fetched:
+                    budget.sample('fetch_page')
+                    self.run_checks(after_check=budget.sample)
+            finally:
+                self.release_dom()
+        
+        self.memory = budget.report()
+        if self.memory['aborted']:
+            print(f"   Audit aborted after {self.memory['aborted_at']}: memory budget of {budget_mb}MB exceeded")
+        
+        return fetched
+    
+    def release_dom(self):
+        """Tear down the parsed tree so its memory is freed right away"""
+        if self.soup is not None:
+            self.soup.decompose()
+            self.soup = None
+    
+    def build_result(self):
+        """Build the audit result dict returned by the web app"""
+        total_issues = sum(len(issues) for issues in self.issues.values())
+        
+        result = {
+            'success': True,
+            'url': self.url,
+            'issues': self.issues,
+            'total_issues': total_issues,
+            'wcag_level': self.calculate_wcag_level(),
+            'stats': self.stats,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if self.frames:
+            result['frames'] = self.frames
+        
+        if self.memory:
+            result['memory'] = self.memory
+            result['partial'] = self.memory['aborted']
+        
+        return result
+    
     def run_audit(self):
         """Run all checks"""
         print("\nStarting accessibility audit...\n")
@@ -587,36 +967,40 @@ class AccessibilityAgent:
         if not self.fetch_page():
             return
         
-        # Basic checks
-        self.check_lang_attribute()
-        self.check_headings_hierarchy()
-        self.check_images_alt_text()
-        self.check_links_text()
-        
-        # Form and interaction checks
-        self.check_form_labels()
-        self.check_buttons()
-        self.check_tables()
-        
-        # Structure checks
-        self.check_aria_landmarks()
-        self.check_skip_links()
-        
-        # Visual checks (limited without CSS parsing)
-        self.check_color_contrast()
+        self.run_checks()
         
         self.generate_report()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Accessibility Audit Agent')
+    parser.add_argument('url', nargs='?', help='URL to check (asked interactively if omitted)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Profile the audit and write collapsed stacks (flamegraph format) to FILE')
+    args = parser.parse_args()
+    
     print("Accessibility Audit Agent")
     print("="*60)
     
-    url = input("\nEnter URL to check: ").strip()
+    url = args.url or input("\nEnter URL to check: ").strip()
     
     if not url:
         print("No URL provided")
         exit()
     
     agent = AccessibilityAgent(url)
-    agent.run_audit()
+    
+    if args.profile:
+        fetched, profile = profile_audit(agent)
+        if fetched:
+            agent.generate_report()
+        
+        with open(args.profile, 'w', encoding='utf-8') as f:
+            f.write(profile['collapsed'])
+        
+        print(f"\nProfile: {profile['duration_ms']}ms total, fetch {profile['fetch_ms']}ms, {profile['samples']} samples")
+        for check_name, ms in sorted(profile['checks_ms'].items(), key=lambda item: -item[1]):
+            print(f"   {check_name}: {ms}ms")
+        print(f"Collapsed stacks written to {args.profile}")
+    else:
+        agent.run_audit()
@@ -1,7 +1,14 @@
-from flask import Flask, render_template, request, jsonify, make_response
+from flask import Flask, render_template, request, jsonify, make_response, Response, stream_with_context
 from accessibility_agent import AccessibilityAgent
+from audit_store import AuditStore
+from image_probe import ImageProbe
+from profiler import profile_audit
+from audit_export import EXPORT_FORMATS, iter_export, pyarrow
+from single_flight import SingleFlight, normalize_url
 import traceback
 import json
+import hmac
+import os
 from datetime import datetime
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
@@ -19,6 +26,76 @@ app = Flask(__name__)
 # Store last audit result for download
 last_audit_result = None
 
+# Coalesces concurrent audits of the same URL (across threads and workers)
+audit_flight = SingleFlight(os.environ.get('AUDIT_LOCK_DIR'))
+
+# Every audit is stored for bulk export
+audit_store = AuditStore()
+
+# Optional image probing; one probe per worker so its cache is shared across audits
+image_probe = ImageProbe() if os.environ.get('AUDIT_PROBE_IMAGES') == '1' else None
+
+# Iframe auditing: off unless AUDIT_MAX_FRAMES is set; cross-site frames need their host listed
+frame_options = {
+    'max_frames': int(os.environ.get('AUDIT_MAX_FRAMES', 0)),
+    'max_frame_depth': int(os.environ.get('AUDIT_FRAME_DEPTH', 1)),
+    'frame_hosts': [host.strip() for host in os.environ.get('AUDIT_FRAME_HOSTS', '').split(',') if host.strip()]
+}
+
+# Optional per-audit memory budget; audits over budget return partial results.
+# Memory is measured per process, so it needs single-threaded (sync) workers
+memory_budget_mb = float(os.environ.get('AUDIT_MEMORY_BUDGET_MB', 0)) or None
+
+# Admins (X-Admin-Token header) may profile single audits and export all audits; unset disables both
+admin_token = os.environ.get('AUDIT_ADMIN_TOKEN')
+
+def is_admin():
+    """Whether the request carries the admin token"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(admin_token) and hmac.compare_digest(token, admin_token)
+
+def requested_audit():
+    """The audit named by ?audit_id=, or this worker's last audit"""
+    audit_id = request.args.get('audit_id', type=int)
+    # Under several workers the last audit is per process, so downloads should name theirs
+    if audit_id is not None:
+        return audit_store.get(audit_id)
+    return last_audit_result
+
+def run_audit(url, profile=False):
+    """Fetch the page and run all checks, returning the result or None"""
+    agent = AccessibilityAgent(url, image_probe=image_probe, **frame_options)
+    
+    if profile:
+        # Profiled runs skip the memory budget - they're for finding out where time goes
+        fetched, profile_data = profile_audit(agent)
+        if not fetched:
+            return None
+    elif memory_budget_mb:
+        if not agent.run_bounded_audit(memory_budget_mb):
+            return None
+    else:
+        if not agent.fetch_page():
+            return None
+        
+        agent.run_checks()
+        agent.release_dom()
+    
+    result = agent.build_result()
+    result['audit_id'] = audit_store.save(result)
+    
+    if profile:
+        audit_store.save_profile(result['audit_id'], profile_data)
+        result['profile'] = {
+            'duration_ms': profile_data['duration_ms'],
+            'fetch_ms': profile_data['fetch_ms'],
+            'checks_ms': profile_data['checks_ms'],
+            'samples': profile_data['samples'],
+            'profile_url': f"/profile/{result['audit_id']}"
+        }
+    
+    return result
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -34,43 +111,30 @@ def audit():
         if not url:
             return jsonify({'error': 'Please provide a URL'}), 400
         
+        # Threaded and async workers run audits side by side, and the budget would count them all
+        if memory_budget_mb and request.environ.get('wsgi.multithread'):
+            return jsonify({'error': 'AUDIT_MEMORY_BUDGET_MB requires single-threaded workers '
+                                     '(gunicorn --worker-class sync --threads 1)'}), 500
+        
         # Add protocol if missing
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        # Run the audit
-        agent = AccessibilityAgent(url)
+        if data.get('profile'):
+            if not is_admin():
+                return jsonify({'error': 'Profiling is restricted to admins'}), 403
+            
+            # A profile must come from its own run, so profiled audits are never coalesced
+            result, shared = run_audit(url, profile=True), False
+        else:
+            # Concurrent audits of the same page share one execution
+            result, shared = audit_flight.do(normalize_url(url), lambda: run_audit(url))
         
-        if not agent.fetch_page():
+        if result is None:
             return jsonify({'error': 'Failed to fetch the page. Please check the URL.'}), 400
         
-        # Run all checks
-        agent.check_lang_attribute()
-        agent.check_headings_hierarchy()
-        agent.check_images_alt_text()
-        agent.check_links_text()
-        agent.check_form_labels()
-        agent.check_buttons()
-        agent.check_tables()
-        agent.check_aria_landmarks()
-        agent.check_skip_links()
-        agent.check_color_contrast()
-        
-        # Calculate summary
-        total_issues = sum(len(issues) for issues in agent.issues.values())
-        
-        # Calculate WCAG conformance level
-        wcag_level = agent.calculate_wcag_level()
-        
-        result = {
-            'success': True,
-            'url': url,
-            'issues': agent.issues,
-            'total_issues': total_issues,
-            'wcag_level': wcag_level,
-            'stats': agent.stats,
-            'timestamp': datetime.now().isoformat()
-        }
+        if shared:
+            print(f"Joined in-flight audit of {url}")
         
         # Store for download
         last_audit_result = result
@@ -85,9 +149,9 @@ def audit():
 @app.route('/download-report')
 def download_report():
     """Download detailed accessibility report as PDF"""
-    global last_audit_result
+    audit_result = requested_audit()
     
-    if not last_audit_result:
+    if not audit_result:
         return jsonify({'error': 'No audit data available. Please run an audit first.'}), 400
     
     # Create PDF in memory
@@ -135,23 +199,28 @@ def download_report():
     elements.append(Spacer(1, 0.3*inch))
     
     # Site info
-    elements.append(Paragraph(f'אתר נבדק: {html.escape(last_audit_result["url"])}', normal_style))
-    elements.append(Paragraph(f'תאריך: {html.escape(last_audit_result["timestamp"])}', normal_style))
+    elements.append(Paragraph(f'אתר נבדק: {html.escape(audit_result["url"])}', normal_style))
+    elements.append(Paragraph(f'תאריך: {html.escape(audit_result["timestamp"])}', normal_style))
     elements.append(Spacer(1, 0.2*inch))
     
     # WCAG Level summary
     elements.append(Paragraph('מידע על רמת WCAG', heading_style))
-    elements.append(Paragraph(f'סוג האתר: {html.escape(last_audit_result["wcag_level"]["site_type"])}', normal_style))
-    elements.append(Paragraph(f'רמה נדרשת: {html.escape(last_audit_result["wcag_level"]["required_level"])}', normal_style))
-    elements.append(Paragraph(f'רמה שהושגה: {html.escape(last_audit_result["wcag_level"]["achieved_label"])}', normal_style))
-    elements.append(Paragraph(html.escape(last_audit_result["wcag_level"]["achieved_description"]), normal_style))
+    elements.append(Paragraph(f'סוג האתר: {html.escape(audit_result["wcag_level"]["site_type"])}', normal_style))
+    elements.append(Paragraph(f'רמה נדרשת: {html.escape(audit_result["wcag_level"]["required_level"])}', normal_style))
+    elements.append(Paragraph(f'רמה שהושגה: {html.escape(audit_result["wcag_level"]["achieved_label"])}', normal_style))
+    elements.append(Paragraph(html.escape(audit_result["wcag_level"]["achieved_description"]), normal_style))
+    if audit_result.get('partial'):
+        elements.append(Paragraph('בדיקה חלקית: חלק מהבדיקות לא רצו, ולכן הבעיות שלהלן אינן רשימה מלאה', normal_style))
     elements.append(Spacer(1, 0.2*inch))
     
     # WCAG Levels table
     elements.append(Paragraph('סטטוס עמידה ברמות WCAG', heading_style))
     wcag_data = [['Level', 'Status', 'Description']]
-    for level, info in last_audit_result['wcag_level']['all_levels'].items():
-        status = 'Pass' if info['passes'] else 'Fail'
+    for level, info in audit_result['wcag_level']['all_levels'].items():
+        if info['passes'] is None:
+            status = 'Incomplete'
+        else:
+            status = 'Pass' if info['passes'] else 'Fail'
         wcag_data.append([html.escape(info['label']), status, html.escape(info['description'])])
     
     wcag_table = Table(wcag_data, colWidths=[1.5*inch, 1*inch, 3.5*inch])
@@ -170,11 +239,11 @@ def download_report():
     
     # Issues summary
     elements.append(Paragraph('סיכום בעיות', heading_style))
-    elements.append(Paragraph(f'סה"כ בעיות: {last_audit_result["total_issues"]}', normal_style))
-    elements.append(Paragraph(f'קריטיות: {len(last_audit_result["issues"]["critical"])}', normal_style))
-    elements.append(Paragraph(f'גבוהות: {len(last_audit_result["issues"]["high"])}', normal_style))
-    elements.append(Paragraph(f'בינוניות: {len(last_audit_result["issues"]["medium"])}', normal_style))
-    elements.append(Paragraph(f'נמוכות: {len(last_audit_result["issues"]["low"])}', normal_style))
+    elements.append(Paragraph(f'סה"כ בעיות: {audit_result["total_issues"]}', normal_style))
+    elements.append(Paragraph(f'קריטיות: {len(audit_result["issues"]["critical"])}', normal_style))
+    elements.append(Paragraph(f'גבוהות: {len(audit_result["issues"]["high"])}', normal_style))
+    elements.append(Paragraph(f'בינוניות: {len(audit_result["issues"]["medium"])}', normal_style))
+    elements.append(Paragraph(f'נמוכות: {len(audit_result["issues"]["low"])}', normal_style))
     elements.append(Spacer(1, 0.3*inch))
     
     # Detailed issues
@@ -186,7 +255,7 @@ def download_report():
     ]
     
     for priority_key, priority_name in priorities:
-        issues = last_audit_result['issues'][priority_key]
+        issues = audit_result['issues'][priority_key]
         if issues:
             elements.append(PageBreak())
             elements.append(Paragraph(f'{priority_name} ({len(issues)})', heading_style))
@@ -199,6 +268,9 @@ def download_report():
                 if 'count' in issue:
                     elements.append(Paragraph(f'   מספר מופעים: {issue["count"]}', normal_style))
                 
+                if 'frame' in issue:
+                    elements.append(Paragraph(f'   בתוך iframe: {html.escape(issue["frame"])}', normal_style))
+                
                 if 'examples' in issue and issue['examples']:
                     elements.append(Paragraph('   דוגמאות:', normal_style))
                     for example in issue['examples'][:5]:
@@ -210,18 +282,18 @@ def download_report():
     # Statistics
     elements.append(PageBreak())
     elements.append(Paragraph('סטטיסטיקות מפורטות', heading_style))
-    elements.append(Paragraph(f'תמונות: {last_audit_result["stats"]["total_images"]} סה"כ, '
-                             f'{last_audit_result["stats"]["images_without_alt"]} ללא alt', normal_style))
-    elements.append(Paragraph(f'קישורים: {last_audit_result["stats"]["total_links"]} סה"כ, '
-                             f'{last_audit_result["stats"]["unclear_links"]} לא ברורים', normal_style))
-    elements.append(Paragraph(f'שדות טופס: {last_audit_result["stats"]["total_forms"]} סה"כ, '
-                             f'{last_audit_result["stats"]["forms_without_labels"]} ללא labels', normal_style))
-    elements.append(Paragraph(f'כפתורים: {last_audit_result["stats"]["total_buttons"]} סה"כ, '
-                             f'{last_audit_result["stats"]["buttons_without_text"]} ללא טקסט', normal_style))
-    elements.append(Paragraph(f'טבלאות: {last_audit_result["stats"]["total_tables"]} סה"כ, '
-                             f'{last_audit_result["stats"]["tables_without_headers"]} ללא headers', normal_style))
-    elements.append(Paragraph(f'כותרות H1: {last_audit_result["stats"]["h1_count"]}', normal_style))
-    elements.append(Paragraph(f'שפת הדף: {"כן" if last_audit_result["stats"]["has_lang"] else "לא"}', normal_style))
+    elements.append(Paragraph(f'תמונות: {audit_result["stats"]["total_images"]} סה"כ, '
+                             f'{audit_result["stats"]["images_without_alt"]} ללא alt', normal_style))
+    elements.append(Paragraph(f'קישורים: {audit_result["stats"]["total_links"]} סה"כ, '
+                             f'{audit_result["stats"]["unclear_links"]} לא ברורים', normal_style))
+    elements.append(Paragraph(f'שדות טופס: {audit_result["stats"]["total_forms"]} סה"כ, '
+                             f'{audit_result["stats"]["forms_without_labels"]} ללא labels', normal_style))
+    elements.append(Paragraph(f'כפתורים: {audit_result["stats"]["total_buttons"]} סה"כ, '
+                             f'{audit_result["stats"]["buttons_without_text"]} ללא טקסט', normal_style))
+    elements.append(Paragraph(f'טבלאות: {audit_result["stats"]["total_tables"]} סה"כ, '
+                             f'{audit_result["stats"]["tables_without_headers"]} ללא headers', normal_style))
+    elements.append(Paragraph(f'כותרות H1: {audit_result["stats"]["h1_count"]}', normal_style))
+    elements.append(Paragraph(f'שפת הדף: {"כן" if audit_result["stats"]["has_lang"] else "לא"}', normal_style))
     
     # Build PDF
     doc.build(elements)
@@ -240,16 +312,57 @@ def download_report():
 @app.route('/download-json')
 def download_json():
     """Download audit data as JSON"""
-    global last_audit_result
+    audit_result = requested_audit()
     
-    if not last_audit_result:
+    if not audit_result:
         return jsonify({'error': 'No audit data available'}), 400
     
-    response = make_response(json.dumps(last_audit_result, ensure_ascii=False, indent=2))
+    response = make_response(json.dumps(audit_result, ensure_ascii=False, indent=2))
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     response.headers['Content-Disposition'] = f'attachment; filename=accessibility-data-{datetime.now().strftime("%Y%m%d-%H%M%S")}.json'
     
     return response
 
+@app.route('/profile/<int:audit_id>')
+def download_profile(audit_id):
+    """Download the profile of a profiled audit (admins only)"""
+    if not is_admin():
+        return jsonify({'error': 'Profiling is restricted to admins'}), 403
+    
+    profile = audit_store.get_profile(audit_id)
+    if not profile:
+        return jsonify({'error': 'No profile for this audit'}), 404
+    
+    # Collapsed stacks, ready for flamegraph.pl / speedscope
+    if request.args.get('format') == 'collapsed':
+        response = make_response(profile['collapsed'])
+        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+        response.headers['Content-Disposition'] = f'attachment; filename=audit-{audit_id}.folded'
+        return response
+    
+    return jsonify(profile)
+
+@app.route('/export')
+def export_audits():
+    """Stream every stored audit as gzip JSONL, Parquet or Arrow (admins only)"""
+    if not is_admin():
+        return jsonify({'error': 'Export is restricted to admins'}), 403
+    
+    export_format = request.args.get('format', 'jsonl')
+    hosts = request.args.getlist('site') or None
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown export format. Use one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    if export_format != 'jsonl' and pyarrow is None:
+        return jsonify({'error': 'Columnar export requires pyarrow to be installed'}), 400
+    
+    # No Content-Length, so the export is sent with chunked transfer encoding
+    response = Response(stream_with_context(iter_export(audit_store, export_format, hosts)),
+                        mimetype=EXPORT_FORMATS[export_format]['mimetype'])
+    response.headers['Content-Disposition'] = f'attachment; filename=accessibility-audits-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{EXPORT_FORMATS[export_format]["extension"]}'
+    
+    return response
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=not memory_budget_mb)
@@ -0,0 +1,196 @@
+"""Streaming bulk export of stored audits.
+
+Usage:
+    python audit_export.py --format jsonl --output audits.jsonl.gz
+    python audit_export.py --format parquet --output audits.parquet --sites sites.txt
+"""
+import argparse
+import zlib
+
+from accessibility_agent import DEFAULT_STATS
+from audit_store import AuditStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Columnar formats are optional
+    pyarrow = None
+
+
+PRIORITIES = ['critical', 'high', 'medium', 'low']
+
+EXPORT_FORMATS = {
+    'jsonl': {'mimetype': 'application/gzip', 'extension': 'jsonl.gz'},
+    'parquet': {'mimetype': 'application/vnd.apache.parquet', 'extension': 'parquet'},
+    'arrow': {'mimetype': 'application/vnd.apache.arrow.stream', 'extension': 'arrows'},
+}
+
+# Compress in chunks of about this size, so each yielded chunk is worth sending
+JSONL_CHUNK_SIZE = 64 * 1024
+
+
+def flatten_result(audit_id: int, result: dict) -> dict:
+    """Flatten an audit result into one row of scalar columns"""
+    wcag_level = result.get('wcag_level', {})
+    stats = result.get('stats', {})
+
+    row = {
+        'audit_id': audit_id,
+        'url': result.get('url'),
+        'timestamp': result.get('timestamp'),
+        'total_issues': result.get('total_issues'),
+        'partial': result.get('partial', False),
+        'achieved_level': wcag_level.get('achieved_level'),
+        'required_level': wcag_level.get('required_level'),
+        'site_type': wcag_level.get('site_type'),
+        'meets_required': wcag_level.get('meets_required'),
+    }
+
+    for priority in PRIORITIES:
+        row[f'issues_{priority}'] = len(result.get('issues', {}).get(priority, []))
+
+    # Older audits may predate some stats - those columns stay empty
+    for key in DEFAULT_STATS:
+        row[f'stats_{key}'] = stats.get(key)
+
+    return row
+
+
+def export_schema():
+    """Arrow schema of the flattened export columns"""
+    fields = [
+        ('audit_id', pyarrow.int64()),
+        ('url', pyarrow.string()),
+        ('timestamp', pyarrow.string()),
+        ('total_issues', pyarrow.int64()),
+        ('partial', pyarrow.bool_()),
+        ('achieved_level', pyarrow.string()),
+        ('required_level', pyarrow.string()),
+        ('site_type', pyarrow.string()),
+        ('meets_required', pyarrow.bool_()),
+    ]
+    fields += [(f'issues_{priority}', pyarrow.int64()) for priority in PRIORITIES]
+    fields += [
+        (f'stats_{key}', pyarrow.bool_() if isinstance(default, bool) else pyarrow.int64())
+        for key, default in DEFAULT_STATS.items()
+    ]
+    return pyarrow.schema(fields)
+
+
+def iter_jsonl_gzip(store: AuditStore, hosts=None, level: int = 6):
+    """Yield a gzip-compressed JSONL export of stored audits, chunk by chunk"""
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+
+    for audit_id, raw in store.iter_raw(hosts):
+        # Stored results are already compact JSON - splice the id in instead of re-encoding
+        line = f'{{"audit_id": {audit_id}, {raw[1:]}'
+        pending.append(line.encode('utf-8') + b'\n')
+        pending_size += len(pending[-1])
+
+        if pending_size >= JSONL_CHUNK_SIZE:
+            chunk = compressor.compress(b''.join(pending))
+            pending = []
+            pending_size = 0
+            if chunk:
+                yield chunk
+
+    yield compressor.compress(b''.join(pending)) + compressor.flush()
+
+
+class _ChunkSink:
+    """Write-only file object that collects bytes for a generator to yield"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_columnar(store: AuditStore, export_format: str = 'parquet', hosts=None, batch_size: int = 5000):
+    """Yield a Parquet file or Arrow IPC stream of stored audits, chunk by chunk.
+
+    Every batch of rows becomes its own row group / record batch and is
+    yielded as soon as it is written, so memory is bounded by batch_size.
+    """
+    if pyarrow is None:
+        raise RuntimeError('Columnar export requires pyarrow (pip install pyarrow)')
+
+    schema = export_schema()
+    sink = _ChunkSink()
+    stream = pyarrow.PythonFile(sink, mode='w')
+
+    if export_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(stream, schema, compression='zstd')
+    else:
+        writer = pyarrow.ipc.new_stream(stream, schema)
+
+    rows = []
+    for result in store.iter_results(hosts):
+        rows.append(flatten_result(result.pop('audit_id'), result))
+        if len(rows) >= batch_size:
+            writer.write_batch(pyarrow.RecordBatch.from_pylist(rows, schema=schema))
+            rows = []
+            yield sink.drain()
+
+    if rows:
+        writer.write_batch(pyarrow.RecordBatch.from_pylist(rows, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(store: AuditStore, export_format: str, hosts=None):
+    """Yield the export in the requested format"""
+    if export_format == 'jsonl':
+        return iter_jsonl_gzip(store, hosts)
+    if export_format in ('parquet', 'arrow'):
+        return iter_columnar(store, export_format, hosts)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def read_sites(path: str):
+    """Read one site host per line, ignoring blanks and # comments"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export stored accessibility audits')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+    parser.add_argument('--output', help='Output file (default: audits.<format extension>)')
+    parser.add_argument('--sites', help='File with one site host per line to export')
+    parser.add_argument('--db', help='Audit database path (default: $AUDIT_DB_PATH or audits.db)')
+    args = parser.parse_args()
+
+    output = args.output or f"audits.{EXPORT_FORMATS[args.format]['extension']}"
+    hosts = read_sites(args.sites) if args.sites else None
+
+    written = 0
+    with open(output, 'wb') as f:
+        for chunk in iter_export(AuditStore(args.db), args.format, hosts):
+            f.write(chunk)
+            written += len(chunk)
+
+    print(f"Exported to {output} ({written} bytes)")
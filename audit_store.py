@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+from urllib.parse import urlsplit
+
+
+DEFAULT_DB_PATH = 'audits.db'
+
+# Audits read per id lookup - stays under SQLite's limit on bound parameters
+ID_CHUNK_SIZE = 500
+
+
+class AuditStore:
+    """SQLite store of audit results, shared by all workers on a host"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get('AUDIT_DB_PATH', DEFAULT_DB_PATH)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS audits (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    result TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS audits_host ON audits (host)')
+            # WCAG verdicts recomputed from stored stats, per scoring policy
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    audit_id INTEGER NOT NULL,
+                    policy TEXT NOT NULL,
+                    site_type TEXT NOT NULL,
+                    required_level TEXT NOT NULL,
+                    achieved_level TEXT NOT NULL,
+                    meets_required INTEGER NOT NULL,
+                    PRIMARY KEY (audit_id, policy)
+                )
+            ''')
+            # Profiles of audits run with profiling on
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS profiles (
+                    audit_id INTEGER PRIMARY KEY,
+                    profile TEXT NOT NULL
+                )
+            ''')
+
+    def _connect(self):
+        # A connection per operation - sqlite connections can't cross threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, result: dict) -> int:
+        """Store an audit result and return its audit id"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO audits (url, host, timestamp, result) VALUES (?, ?, ?, ?)',
+                (
+                    result['url'],
+                    (urlsplit(result['url']).hostname or '').lower(),
+                    result['timestamp'],
+                    json.dumps(result, ensure_ascii=False),
+                )
+            )
+            return cursor.lastrowid
+
+    def save_verdicts(self, verdicts):
+        """Store re-scored verdicts, replacing earlier ones for the same policy"""
+        with self._connect() as conn:
+            conn.executemany(
+                '''INSERT OR REPLACE INTO verdicts
+                   (audit_id, policy, site_type, required_level, achieved_level, meets_required)
+                   VALUES (:audit_id, :policy, :site_type, :required_level, :achieved_level, :meets_required)''',
+                verdicts
+            )
+
+    def save_profile(self, audit_id: int, profile: dict):
+        """Store the profile of an audit"""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO profiles (audit_id, profile) VALUES (?, ?)',
+                (audit_id, json.dumps(profile, ensure_ascii=False))
+            )
+
+    def get_profile(self, audit_id: int):
+        """Return the stored profile of an audit, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT profile FROM profiles WHERE audit_id = ?', (audit_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, audit_id: int):
+        """Return a stored audit result, or None if it doesn't exist"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT result FROM audits WHERE id = ?', (audit_id,)).fetchone()
+        if not row:
+            return None
+        result = json.loads(row[0])
+        result['audit_id'] = audit_id
+        return result
+
+    def iter_raw(self, hosts=None, batch_size: int = 500):
+        """Yield (audit_id, result JSON text) for stored audits, oldest first.
+
+        Rows are read in batches so the whole table never has to fit in
+        memory. hosts optionally limits the export to a set of sites.
+        """
+        conn = self._connect()
+        try:
+            if not hosts:
+                cursor = conn.execute('SELECT id, result FROM audits ORDER BY id')
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+                return
+
+            # The hosts go in a temp table so the audits_host index finds their audits;
+            # only the ids are sorted, the results are then read by primary key
+            conn.execute('CREATE TEMP TABLE export_hosts (host TEXT PRIMARY KEY)')
+            conn.executemany('INSERT OR IGNORE INTO export_hosts (host) VALUES (?)',
+                             ((host.lower(),) for host in hosts))
+            conn.commit()
+            ids = conn.execute('SELECT id FROM audits WHERE host IN (SELECT host FROM export_hosts) ORDER BY id')
+            while True:
+                batch = [audit_id for audit_id, in ids.fetchmany(min(batch_size, ID_CHUNK_SIZE))]
+                if not batch:
+                    break
+                placeholders = ','.join('?' * len(batch))
+                yield from conn.execute(f'SELECT id, result FROM audits WHERE id IN ({placeholders}) ORDER BY id',
+                                        batch)
+        finally:
+            conn.close()
+
+    def iter_results(self, hosts=None, batch_size: int = 500):
+        """Yield stored audit results as dicts, with their audit_id"""
+        for audit_id, raw in self.iter_raw(hosts, batch_size):
+            result = json.loads(raw)
+            result['audit_id'] = audit_id
+            yield result
@@ -0,0 +1,218 @@
+import base64
+import re
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_to_bytes
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Enough for the header of PNG/GIF/WebP/SVG and most JPEGs
+PROBE_BYTES = 16 * 1024
+
+# Images this small are tracking pixels or spacers, never content
+TRACKING_PIXEL_MAX_SIZE = 3
+SPACER_MAX_THICKNESS = 2
+
+
+def parse_image_header(data: bytes):
+    """Read image type and dimensions from the first bytes of an image.
+
+    Returns a dict with type, width and height (None if unknown), or None
+    if the bytes aren't a recognized image format.
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return {'type': 'png', 'width': width, 'height': height}
+
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        width, height = struct.unpack('<HH', data[6:10])
+        return {'type': 'gif', 'width': width, 'height': height}
+
+    if data.startswith(b'\xff\xd8'):
+        return _parse_jpeg(data)
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _parse_webp(data)
+
+    if data[:2] == b'BM' and len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        return {'type': 'bmp', 'width': width, 'height': abs(height)}
+
+    head = data[:4096].decode('utf-8', errors='ignore')
+    if '<svg' in head:
+        return _parse_svg(head)
+
+    return None
+
+
+def _parse_jpeg(data):
+    """Find the SOF segment holding JPEG dimensions"""
+    info = {'type': 'jpeg', 'width': None, 'height': None}
+    offset = 2
+
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            break
+        marker = data[offset + 1]
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            info['width'], info['height'] = width, height
+            break
+        segment_length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        offset += 2 + segment_length
+
+    return info
+
+
+def _parse_webp(data):
+    info = {'type': 'webp', 'width': None, 'height': None}
+    chunk = data[12:16]
+
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        info['width'], info['height'] = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b'VP8L' and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], 'little')
+        info['width'], info['height'] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    elif chunk == b'VP8X' and len(data) >= 30:
+        info['width'] = int.from_bytes(data[24:27], 'little') + 1
+        info['height'] = int.from_bytes(data[27:30], 'little') + 1
+
+    return info
+
+
+def _parse_svg(head):
+    info = {'type': 'svg', 'width': None, 'height': None}
+    svg_tag = re.search(r'<svg\b[^>]*>', head, re.IGNORECASE | re.DOTALL)
+    if not svg_tag:
+        return info
+
+    tag = svg_tag.group(0)
+    width = re.search(r'\bwidth\s*=\s*["\']\s*(\d+(?:\.\d+)?)(px)?\s*["\']', tag)
+    height = re.search(r'\bheight\s*=\s*["\']\s*(\d+(?:\.\d+)?)(px)?\s*["\']', tag)
+    if width and height:
+        info['width'], info['height'] = round(float(width.group(1))), round(float(height.group(1)))
+        return info
+
+    view_box = re.search(r'\bviewBox\s*=\s*["\']\s*-?\d+(?:\.\d+)?[\s,]+-?\d+(?:\.\d+)?[\s,]+(\d+(?:\.\d+)?)[\s,]+(\d+(?:\.\d+)?)', tag)
+    if view_box:
+        info['width'], info['height'] = round(float(view_box.group(1))), round(float(view_box.group(2)))
+
+    return info
+
+
+def classify_image(img, info):
+    """Classify an <img> as 'decorative', 'informative' or 'unknown'"""
+    if img.get('role') in ('presentation', 'none') or img.get('aria-hidden') == 'true':
+        return 'decorative'
+
+    if not info or not info.get('width') or not info.get('height'):
+        return 'unknown'
+
+    width, height = info['width'], info['height']
+    if max(width, height) <= TRACKING_PIXEL_MAX_SIZE or min(width, height) <= SPACER_MAX_THICKNESS:
+        return 'decorative'
+
+    return 'informative'
+
+
+class ImageProbe:
+    """Fetch just the header bytes of images to learn their type and size.
+
+    Uses HTTP Range requests through a shared session that keeps a bounded
+    connection pool per host. Results are cached per image URL, so an
+    image shared by many pages (logos, spacers) is only probed once.
+    """
+
+    def __init__(self, max_workers: int = 8, connections_per_host: int = 4,
+                 timeout: float = 5, cache_size: int = 10000):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # pool_block caps the open connections to any single host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=connections_per_host, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def probe_all(self, urls):
+        """Probe image URLs concurrently, returning {url: info or None}"""
+        urls = list(dict.fromkeys(urls))
+        results = {}
+        to_fetch = []
+
+        with self._cache_lock:
+            for url in urls:
+                if url.startswith('data:'):
+                    results[url] = self._parse_data_uri(url)
+                elif url in self._cache:
+                    self._cache.move_to_end(url)
+                    results[url] = self._cache[url]
+                else:
+                    to_fetch.append(url)
+
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_fetch))) as executor:
+                for url, info in zip(to_fetch, executor.map(self.probe, to_fetch)):
+                    results[url] = info
+
+        return results
+
+    def probe(self, url: str):
+        """Probe a single image URL, using the cache when possible"""
+        # Inline images are parsed locally - not worth a cache slot
+        if url.startswith('data:'):
+            return self._parse_data_uri(url)
+
+        with self._cache_lock:
+            if url in self._cache:
+                self._cache.move_to_end(url)
+                return self._cache[url]
+
+        info = self._fetch_info(url)
+
+        with self._cache_lock:
+            self._cache[url] = info
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return info
+
+    def _fetch_info(self, url):
+        try:
+            # stream=True so a server that ignores Range still sends us only PROBE_BYTES
+            with self.session.get(url, headers={'Range': f'bytes=0-{PROBE_BYTES - 1}'},
+                                  timeout=self.timeout, stream=True) as response:
+                if response.status_code not in (200, 206):
+                    return None
+                data = b''
+                for chunk in response.iter_content(chunk_size=PROBE_BYTES):
+                    data += chunk
+                    if len(data) >= PROBE_BYTES:
+                        break
+            return parse_image_header(data[:PROBE_BYTES])
+        except requests.RequestException as e:
+            print(f"   Could not probe image {url}: {e}")
+            return None
+        except (ValueError, struct.error) as e:
+            print(f"   Could not parse image {url}: {e}")
+            return None
+
+    def _parse_data_uri(self, url):
+        header, _, payload = url.partition(',')
+        try:
+            if header.endswith(';base64'):
+                data = base64.b64decode(payload[:PROBE_BYTES * 2])
+            else:
+                data = unquote_to_bytes(payload[:PROBE_BYTES])
+            return parse_image_header(data[:PROBE_BYTES])
+        except (ValueError, struct.error):
+            return None
@@ -0,0 +1,312 @@
+"""Offline load test of the web app under gunicorn.
+
+Starts a local fixture web server serving synthetic sites, runs app.py under
+gunicorn with several worker configurations, and drives /audit,
+/download-report and /download-json at increasing concurrency. Reports
+throughput, p50/p95/p99 latency and error rate per configuration.
+
+Errors (5xx and timeouts) are reported apart from 4xx rejections. Downloads
+name their audit with ?audit_id=: without it the app serves the last audit
+of whichever worker takes the request, and with several workers that is
+often one that hasn't run an audit yet - a 400 that grows with the number
+of workers rather than with load.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --concurrency 1 4 16 --page-kb 200 --latency-ms 100 --failure-rate 0.05
+    python loadtest.py --workers sync threaded --json loadtest.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import find_spec
+
+import requests
+
+
+# gunicorn arguments per worker configuration
+WORKER_CONFIGS = {
+    'sync': ['--worker-class', 'sync', '--workers', '4'],
+    'threaded': ['--worker-class', 'gthread', '--workers', '2', '--threads', '8'],
+    'async': ['--worker-class', 'gevent', '--workers', '2', '--worker-connections', '100'],
+}
+
+# Python packages a worker class needs besides gunicorn
+WORKER_REQUIREMENTS = {
+    'async': 'gevent',
+}
+
+ENDPOINTS = ['/audit', '/download-report', '/download-json']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def synthetic_page(page_id: int, size_kb: int) -> bytes:
+    """Deterministic HTML page of roughly size_kb with a mix of accessibility issues"""
+    rng = random.Random(page_id)
+    blocks = [
+        '<h2>Section {n}</h2><p>Some text about item {n}.</p>',
+        '<img src="/img/{n}.png"{alt}>',
+        '<a href="/page/{n}">{link_text}</a>',
+        '<label for="f{n}">Field {n}</label><input id="f{n}" type="text"><input type="email">',
+        '<button>{button_text}</button>',
+        '<table><tr><td>{n}</td><td>{n}</td></tr></table>',
+    ]
+
+    lang = ' lang="en"' if page_id % 2 else ''
+    parts = [f'<!DOCTYPE html><html{lang}><head><title>Fixture {page_id}</title></head>'
+             f'<body><a href="#main">Skip to content</a><nav><a href="/">Home</a></nav><main id="main"><h1>Fixture page {page_id}</h1>']
+    size = 0
+    n = 0
+    while size < size_kb * 1024:
+        block = rng.choice(blocks).format(
+            n=n,
+            alt=rng.choice(['', ' alt="Photo"']),
+            link_text=rng.choice(['Details', 'click here', '']),
+            button_text=rng.choice(['Send', '']),
+        )
+        parts.append(block)
+        size += len(block)
+        n += 1
+    parts.append('</main><footer>Fixture footer</footer></body></html>')
+
+    return ''.join(parts).encode('utf-8')
+
+
+class FixtureServer:
+    """Local HTTP server serving synthetic sites with configurable size, latency and failures"""
+
+    def __init__(self, page_kb: int = 50, latency_ms: int = 0, failure_rate: float = 0.0):
+        self.page_kb = page_kb
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.port = free_port()
+        self._pages = {}
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), self._handler())
+        self._server.daemon_threads = True
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if fixture.latency_ms:
+                    time.sleep(fixture.latency_ms / 1000)
+
+                if random.random() < fixture.failure_rate:
+                    self.send_error(503, 'Injected failure')
+                    return
+
+                # /site/<id>?nonce=... - the nonce only keeps audits from being coalesced
+                page_id = sum(map(ord, self.path.split('?')[0]))
+                body = fixture.page(page_id)
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def page(self, page_id: int) -> bytes:
+        if page_id not in self._pages:
+            self._pages[page_id] = synthetic_page(page_id, self.page_kb)
+        return self._pages[page_id]
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class AppServer:
+    """app.py running under gunicorn with one worker configuration"""
+
+    def __init__(self, worker_config: str, data_dir: str):
+        self.worker_config = worker_config
+        self.port = free_port()
+        self.data_dir = data_dir
+        self.process = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env['AUDIT_DB_PATH'] = os.path.join(self.data_dir, f'{self.worker_config}.db')
+        env['AUDIT_LOCK_DIR'] = os.path.join(self.data_dir, f'{self.worker_config}-flights')
+
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{self.port}',
+             '--timeout', '120', '--log-level', 'warning'] + WORKER_CONFIGS[self.worker_config],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn ({self.worker_config}) exited with code {self.process.returncode}")
+            try:
+                requests.get(self.url('/'), timeout=1)
+                return self
+            except requests.RequestException:
+                time.sleep(0.2)
+
+        raise RuntimeError(f"gunicorn ({self.worker_config}) did not start within 30s")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+
+def percentile(sorted_values, pct: float):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def run_level(app_server: AppServer, fixture: FixtureServer, concurrency: int, rounds: int):
+    """Run concurrency * rounds audit sessions; return per-endpoint stats"""
+    samples = {endpoint: [] for endpoint in ENDPOINTS}
+    samples_lock = threading.Lock()
+    sessions = threading.local()
+    nonces = itertools.count()
+
+    def session():
+        # One session per driver thread keeps connections alive like a browser would
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        return sessions.session
+
+    def timed(endpoint, call):
+        """Time one request; return the response, or None on a connection error or timeout"""
+        started = time.perf_counter()
+        try:
+            response = call()
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, None
+        with samples_lock:
+            samples[endpoint].append((time.perf_counter() - started, status))
+        return response
+
+    def audit_session(i):
+        site_url = fixture.url(f"/site/{i % 50}?nonce={next(nonces)}")
+        response = timed('/audit', lambda: session().post(app_server.url('/audit'), json={'url': site_url}, timeout=120))
+        if response is None or not response.ok:
+            return
+
+        params = {'audit_id': response.json()['audit_id']}
+        timed('/download-report', lambda: session().get(app_server.url('/download-report'), params=params, timeout=120))
+        timed('/download-json', lambda: session().get(app_server.url('/download-json'), params=params, timeout=120))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(audit_session, range(concurrency * rounds)))
+    elapsed = time.perf_counter() - started
+
+    stats = {}
+    for endpoint, endpoint_samples in samples.items():
+        if not endpoint_samples:
+            continue
+        latencies = sorted(latency for latency, status in endpoint_samples)
+        # 5xx and timeouts are the server failing; 4xx is the request being refused
+        errors = sum(1 for latency, status in endpoint_samples if status is None or status >= 500)
+        rejected = sum(1 for latency, status in endpoint_samples if status is not None and 400 <= status < 500)
+        stats[endpoint] = {
+            'requests': len(endpoint_samples),
+            'throughput_rps': round(len(endpoint_samples) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'error_rate': round(errors / len(endpoint_samples), 4),
+            'client_error_rate': round(rejected / len(endpoint_samples), 4),
+        }
+    return stats
+
+
+def print_report(results):
+    print(f"\n{'workers':<10}{'conc':>6}  {'endpoint':<18}{'req':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'4xx':>9}")
+    print('-' * 97)
+    for row in results:
+        for endpoint, stats in row['endpoints'].items():
+            print(f"{row['workers']:<10}{row['concurrency']:>6}  {endpoint:<18}{stats['requests']:>6}"
+                  f"{stats['throughput_rps']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                  f"{stats['error_rate']:>9.1%}{stats['client_error_rate']:>9.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test app.py under gunicorn against local fixture sites')
+    parser.add_argument('--workers', nargs='+', choices=WORKER_CONFIGS, default=list(WORKER_CONFIGS),
+                        help='Worker configurations to test')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 8, 16, 32],
+                        help='Concurrent clients per level')
+    parser.add_argument('--rounds', type=int, default=3, help='Audit sessions per client at each level')
+    parser.add_argument('--page-kb', type=int, default=50, help='Size of each fixture page')
+    parser.add_argument('--latency-ms', type=int, default=50, help='Fixture server latency per request')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of fixture requests answered with 503')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    data_dir = tempfile.mkdtemp(prefix='accessibility-loadtest-')
+
+    try:
+        with FixtureServer(args.page_kb, args.latency_ms, args.failure_rate) as fixture:
+            for worker_config in args.workers:
+                requirement = WORKER_REQUIREMENTS.get(worker_config)
+                if requirement and find_spec(requirement) is None:
+                    print(f"Skipping {worker_config} workers: {requirement} is not installed")
+                    continue
+
+                print(f"Testing {worker_config} workers...")
+                with AppServer(worker_config, data_dir) as app_server:
+                    for concurrency in args.concurrency:
+                        stats = run_level(app_server, fixture, concurrency, args.rounds)
+                        results.append({'workers': worker_config, 'concurrency': concurrency, 'endpoints': stats})
+                        audit = stats['/audit']
+                        print(f"   concurrency {concurrency}: /audit p95 {audit['p95_ms']}ms, "
+                              f"{audit['throughput_rps']} req/s, {audit['error_rate']:.1%} errors, "
+                              f"{audit['client_error_rate']:.1%} 4xx")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,117 @@
+import gc
+import os
+import threading
+import tracemalloc
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when an audit grows past its memory budget"""
+
+    def __init__(self, step: str, used_mb: float, budget_mb: float):
+        super().__init__(f"Memory budget exceeded after {step}: {used_mb:.1f}MB used, budget {budget_mb:.1f}MB")
+        self.step = step
+        self.used_mb = used_mb
+        self.budget_mb = budget_mb
+
+
+# tracemalloc is process-wide and can't tell one thread's allocations from
+# another's, so only one budget may be measuring at a time
+_tracing_lock = threading.Lock()
+_active_budget = None
+_started_tracing = False
+
+
+def _start_tracing(budget):
+    global _active_budget, _started_tracing
+    with _tracing_lock:
+        if _active_budget is not None:
+            raise RuntimeError('Another audit is already running with a memory budget in this process - '
+                               'memory budgets need one audit at a time per process (single-threaded workers)')
+        _active_budget = budget
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+
+
+def _stop_tracing():
+    global _active_budget, _started_tracing
+    with _tracing_lock:
+        _active_budget = None
+        # Leave tracing alone if someone else (e.g. a debugger) started it
+        if _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _rss_mb():
+    """Current resident set size in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryBudget:
+    """Track the memory an audit allocates and enforce a budget.
+
+    Memory is measured with tracemalloc relative to the moment the budget
+    starts. tracemalloc counts every thread of the process, so the
+    measurement only belongs to the audit if it is the only one running:
+    entering a budget while another is active raises RuntimeError. Threads
+    the audit starts itself (e.g. frame fetches) are counted, as they should be.
+    """
+
+    def __init__(self, budget_mb: float):
+        self.budget_mb = budget_mb
+        self.baseline = 0
+        self.start_peak = 0
+        self.peak = 0
+        self.retained = 0
+        self.aborted_at = None
+        self.rss_start_mb = None
+        self.rss_end_mb = None
+
+    def __enter__(self):
+        _start_tracing(self)
+        self.baseline, self.start_peak = tracemalloc.get_traced_memory()
+        self.rss_start_mb = _rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Parsed trees are full of reference cycles - collect them before measuring
+        gc.collect()
+        self.retained = max(tracemalloc.get_traced_memory()[0] - self.baseline, 0)
+        self.rss_end_mb = _rss_mb()
+        _stop_tracing()
+
+        if exc_type is MemoryBudgetExceeded:
+            self.aborted_at = exc.step
+            return True
+        return False
+
+    def sample(self, step: str):
+        """Record memory use after a step, raising if over budget"""
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, current - self.baseline)
+
+        # The traced peak is process-wide; it only belongs to this audit once it moved
+        if peak > self.start_peak:
+            self.peak = max(self.peak, peak - self.baseline)
+
+        used_mb = (current - self.baseline) / (1024 * 1024)
+        if used_mb > self.budget_mb:
+            raise MemoryBudgetExceeded(step, used_mb, self.budget_mb)
+
+    def report(self):
+        """Memory summary included in the audit result"""
+        return {
+            'budget_mb': self.budget_mb,
+            'peak_mb': round(self.peak / (1024 * 1024), 2),
+            'retained_mb': round(self.retained / (1024 * 1024), 2),
+            'rss_start_mb': round(self.rss_start_mb, 2) if self.rss_start_mb is not None else None,
+            'rss_end_mb': round(self.rss_end_mb, 2) if self.rss_end_mb is not None else None,
+            'aborted': self.aborted_at is not None,
+            'aborted_at': self.aborted_at,
+        }
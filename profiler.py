@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Sample the call stack of one thread at a fixed interval.
+
+    A background thread reads the profiled thread's current frame every
+    interval and counts identical stacks, producing collapsed stacks
+    ("root;caller;callee count" lines) that flamegraph tools read directly.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Profile in collapsed-stack format, heaviest stacks first"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class CheckTimer:
+    """after_check hook for run_checks() that times each check"""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def __call__(self, check_name: str):
+        now = time.perf_counter()
+        self.timings[check_name] = round((now - self._last) * 1000, 2)
+        self._last = now
+
+
+def profile_audit(agent, interval: float = 0.005):
+    """Fetch and check a page under the sampling profiler.
+
+    Returns a (fetched, profile) tuple. The profile holds the time spent
+    fetching, a per-check breakdown in milliseconds and the collapsed stacks.
+    """
+    started = time.perf_counter()
+
+    with SamplingProfiler(interval) as profiler:
+        fetched = agent.fetch_page()
+        fetch_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        timer = CheckTimer()
+        if fetched:
+            agent.run_checks(after_check=timer)
+            agent.release_dom()
+
+    profile = {
+        'interval_ms': interval * 1000,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        'fetch_ms': fetch_ms,
+        'checks_ms': timer.timings,
+        'samples': profiler.samples,
+        'collapsed': profiler.collapsed(),
+    }
+
+    return fetched, profile
@@ -0,0 +1,201 @@
+"""Batch re-scoring of stored audits with a scoring policy.
+
+Applies a policy to the stats and issue counts of stored audits, a whole
+column at a time, without fetching or parsing any page. Requires pyarrow.
+
+Usage:
+    # Re-score every audit in the audit database, storing verdicts next to them
+    python rescore.py --policy policy.json
+
+    # Re-score a Parquet export (python audit_export.py --format parquet)
+    python rescore.py --policy policy.json --parquet audits.parquet --output verdicts.parquet
+"""
+import argparse
+import time
+
+from audit_export import export_schema, flatten_result
+from audit_store import AuditStore
+from scoring_policy import (
+    ISSUE_COUNT_METRICS, LEVEL_HIERARCHY, LEVELS, PCT_METRICS,
+    get_policy, level_rules, load_policy, policy_id,
+)
+
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+    import pyarrow.parquet
+except ImportError:  # Re-scoring needs pyarrow, like the columnar export
+    pyarrow = None
+
+
+# Policy rule operators as pyarrow compute functions
+PC_FUNCTIONS = {
+    '<': 'less',
+    '<=': 'less_equal',
+    '==': 'equal',
+    '!=': 'not_equal',
+    '>=': 'greater_equal',
+    '>': 'greater',
+}
+
+
+def _metric_column(batch, metric):
+    """Compute a rule metric for every audit in the batch"""
+    if metric in PCT_METRICS:
+        count_key, total_key = PCT_METRICS[metric]
+        count = pc.cast(batch.column(f'stats_{count_key}'), pyarrow.float64())
+        total = pc.cast(batch.column(f'stats_{total_key}'), pyarrow.float64())
+        pct = pc.multiply(pc.divide(count, total), 100.0)
+        return pc.if_else(pc.greater(total, 0.0), pct, 0.0)
+    if metric in ISSUE_COUNT_METRICS:
+        return batch.column(f'issues_{ISSUE_COUNT_METRICS[metric]}')
+    return batch.column(f'stats_{metric}')
+
+
+def _level_passes(batch, rules):
+    """Boolean column per level; each level also requires the ones below it"""
+    passes = {}
+    meets_lower = pyarrow.array([True] * batch.num_rows)
+
+    for level in LEVELS:
+        level_passes = meets_lower
+        for rule in rules.get(level, []):
+            mask = pc.call_function(PC_FUNCTIONS[rule['op']], [_metric_column(batch, rule['metric']), rule['value']])
+            # Audits missing a stat can't prove they pass the rule
+            level_passes = pc.and_(level_passes, pc.fill_null(mask, False))
+        passes[level] = level_passes
+        meets_lower = level_passes
+
+    return passes
+
+
+def _site_type_index(batch, policy):
+    """Index into policy['site_types'] per audit (len(site_types) = default)"""
+    site_types = policy['site_types']
+    urls = pc.utf8_lower(batch.column('url'))
+    index = pyarrow.array([len(site_types)] * batch.num_rows, pyarrow.int64())
+
+    # Walk backwards so the first matching site type wins
+    for i in reversed(range(len(site_types))):
+        matches = None
+        for keyword in site_types[i]['keywords']:
+            keyword_matches = pc.match_substring(urls, keyword)
+            matches = keyword_matches if matches is None else pc.or_(matches, keyword_matches)
+        if matches is not None:
+            index = pc.if_else(pc.fill_null(matches, False), i, index)
+
+    return index
+
+
+def rescore_batch(batch, policy):
+    """Apply a policy to a batch of flattened audits (see audit_export.flatten_result).
+
+    Returns a record batch of verdicts, one row per complete audit. Partial
+    audits (cut short by the memory budget) are skipped - the checks that
+    didn't run would score as clean.
+    """
+    if 'partial' in batch.schema.names:
+        batch = batch.filter(pc.invert(pc.fill_null(batch.column('partial'), False)))
+
+    site_types = policy['site_types'] + [policy['default_site_type']]
+    index = _site_type_index(batch, policy)
+
+    passes = _level_passes(batch, policy['levels'])
+
+    # Site types with their own rules are scored separately and patched in
+    for i, site_type in enumerate(site_types):
+        if site_type.get('levels'):
+            is_site_type = pc.equal(index, i)
+            override = _level_passes(batch, level_rules(policy, site_type))
+            for level in LEVELS:
+                passes[level] = pc.if_else(is_site_type, override[level], passes[level])
+
+    achieved_level = pc.if_else(passes['level_aaa'], 'level_aaa',
+                                pc.if_else(passes['level_aa'], 'level_aa',
+                                           pc.if_else(passes['level_a'], 'level_a', 'non_compliant')))
+
+    required_level = pc.take(pyarrow.array([site_type['required_level'] for site_type in site_types]), index)
+    required_rank = pc.take(pyarrow.array([LEVEL_HIERARCHY[site_type['required_level']] for site_type in site_types]), index)
+    achieved_rank = pc.if_else(passes['level_aaa'], 3,
+                               pc.if_else(passes['level_aa'], 2,
+                                          pc.if_else(passes['level_a'], 1, 0)))
+
+    return pyarrow.RecordBatch.from_arrays(
+        [
+            batch.column('audit_id'),
+            pyarrow.array([policy_id(policy)] * batch.num_rows),
+            pc.take(pyarrow.array([site_type['site_type'] for site_type in site_types]), index),
+            required_level,
+            achieved_level,
+            pc.greater_equal(achieved_rank, required_rank),
+            passes['level_a'],
+            passes['level_aa'],
+            passes['level_aaa'],
+        ],
+        names=['audit_id', 'policy', 'site_type', 'required_level', 'achieved_level',
+               'meets_required', 'passes_level_a', 'passes_level_aa', 'passes_level_aaa']
+    )
+
+
+def iter_store_batches(store: AuditStore, batch_size: int = 50000):
+    """Yield stored audits as record batches of flattened columns"""
+    schema = export_schema()
+    rows = []
+
+    for result in store.iter_results(batch_size=batch_size):
+        rows.append(flatten_result(result.pop('audit_id'), result))
+        if len(rows) >= batch_size:
+            yield pyarrow.RecordBatch.from_pylist(rows, schema=schema)
+            rows = []
+
+    if rows:
+        yield pyarrow.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def iter_parquet_batches(path: str, batch_size: int = 500000):
+    """Yield record batches from a Parquet export"""
+    yield from pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_size)
+
+
+def rescore(batches, policy):
+    """Re-score batches of audits, yielding verdict batches"""
+    if pyarrow is None:
+        raise RuntimeError('Re-scoring requires pyarrow (pip install pyarrow)')
+
+    for batch in batches:
+        yield rescore_batch(batch, policy)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-score stored audits with a scoring policy')
+    parser.add_argument('--policy', help='Policy JSON file (default: built-in policy of --jurisdiction)')
+    parser.add_argument('--jurisdiction', help='Built-in policy to use (default: il)')
+    parser.add_argument('--parquet', help='Re-score a Parquet export instead of the audit database')
+    parser.add_argument('--output', help='Write verdicts to this Parquet file (required with --parquet)')
+    parser.add_argument('--db', help='Audit database path (default: $AUDIT_DB_PATH or audits.db)')
+    args = parser.parse_args()
+
+    if args.parquet and not args.output:
+        parser.error('--output is required with --parquet')
+
+    policy = load_policy(args.policy) if args.policy else get_policy(args.jurisdiction)
+    store = None if args.parquet else AuditStore(args.db)
+    batches = iter_parquet_batches(args.parquet) if args.parquet else iter_store_batches(store)
+
+    started = time.perf_counter()
+    total = 0
+    writer = None
+
+    for verdicts in rescore(batches, policy):
+        if args.output:
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(args.output, verdicts.schema)
+            writer.write_batch(verdicts)
+        else:
+            store.save_verdicts(verdicts.to_pylist())
+        total += verdicts.num_rows
+
+    if writer:
+        writer.close()
+
+    print(f"Re-scored {total} audits with {policy_id(policy)} in {time.perf_counter() - started:.2f}s")
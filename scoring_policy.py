@@ -0,0 +1,196 @@
+"""Declarative WCAG scoring policies.
+
+A policy decides which site types need which WCAG level, and which rules a
+page has to pass for each level. Rules compare a metric computed from the
+audit stats and issue counts against a value, so a policy can be applied
+to stored audits without fetching the page again (see rescore.py).
+"""
+import json
+import operator
+
+
+LEVELS = ['level_a', 'level_aa', 'level_aaa']
+
+LEVEL_HIERARCHY = {'non_compliant': 0, 'level_a': 1, 'level_aa': 2, 'level_aaa': 3}
+
+# Metrics computed as a percentage of a total: metric -> (count stat, total stat)
+PCT_METRICS = {
+    'images_without_alt_pct': ('images_without_alt', 'total_images'),
+    'unclear_links_pct': ('unclear_links', 'total_links'),
+    'forms_without_labels_pct': ('forms_without_labels', 'total_forms'),
+}
+
+# Metrics counting the issues of one priority: metric -> priority
+ISSUE_COUNT_METRICS = {
+    'critical_count': 'critical',
+    'high_count': 'high',
+    'medium_count': 'medium',
+    'low_count': 'low',
+}
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+DEFAULT_POLICY = {
+    'name': 'il-default',
+    'version': '1',
+    'jurisdiction': 'il',
+    # First matching site type wins; keywords are matched against the URL
+    'site_types': [
+        {
+            'site_type': 'ממשלתי',
+            'keywords': ['.gov.', 'gov.il', 'משרד', 'ממשלת', 'government'],
+            'required_level': 'level_aaa',
+            'reason': 'אתרי ממשל נדרשים לעמוד ברמת נגישות מקסימלית (AAA)'
+        },
+        {
+            'site_type': 'בנקאות ופיננסים',
+            'keywords': ['bank', 'בנק', 'leumi', 'hapoalim', 'mizrahi', 'discount', 'finance'],
+            'required_level': 'level_aa',
+            'reason': 'אתרי בנקאות ופיננסים נדרשים לעמוד בתקן AA'
+        },
+        {
+            'site_type': 'שירות ציבורי',
+            'keywords': ['health', 'בריאות', 'hospital', 'clinic', 'education', 'חינוך', 'university', 'אוניברסיטה'],
+            'required_level': 'level_aa',
+            'reason': 'שירותי בריאות וחינוך נדרשים לעמוד בתקן AA'
+        },
+        {
+            'site_type': 'מסחר אלקטרוני',
+            'keywords': ['shop', 'store', 'cart', 'buy', 'קנייה'],
+            'required_level': 'level_a',
+            'reason': 'אתרי מסחר מומלצים לעמוד לפחות ברמה A'
+        },
+    ],
+    'default_site_type': {
+        'site_type': 'כללי',
+        'required_level': 'level_a',
+        'reason': 'מומלץ לעמוד לפחות ברמת נגישות בסיסית (A)'
+    },
+    # Each level also requires all the levels below it
+    'levels': {
+        'level_a': [
+            {'name': 'has_lang', 'metric': 'has_lang', 'op': '==', 'value': True},
+            {'name': 'has_h1', 'metric': 'h1_count', 'op': '>=', 'value': 1},
+            {'name': 'all_images_have_alt', 'metric': 'images_without_alt', 'op': '==', 'value': 0},
+            {'name': 'all_links_clear', 'metric': 'unclear_links', 'op': '==', 'value': 0},
+            {'name': 'all_forms_labeled', 'metric': 'forms_without_labels', 'op': '==', 'value': 0},
+            {'name': 'all_buttons_labeled', 'metric': 'buttons_without_text', 'op': '==', 'value': 0},
+        ],
+        'level_aa': [
+            {'name': 'single_h1', 'metric': 'h1_count', 'op': '==', 'value': 1},
+            {'name': 'low_alt_issues', 'metric': 'images_without_alt_pct', 'op': '<', 'value': 10},
+            {'name': 'low_link_issues', 'metric': 'unclear_links_pct', 'op': '<', 'value': 5},
+            {'name': 'low_form_issues', 'metric': 'forms_without_labels_pct', 'op': '<', 'value': 5},
+            {'name': 'tables_accessible', 'metric': 'tables_without_headers', 'op': '==', 'value': 0},
+        ],
+        'level_aaa': [
+            {'name': 'no_critical', 'metric': 'critical_count', 'op': '==', 'value': 0},
+            {'name': 'no_high', 'metric': 'high_count', 'op': '==', 'value': 0},
+            {'name': 'max_medium', 'metric': 'medium_count', 'op': '<=', 'value': 2},
+        ],
+    },
+}
+
+# Built-in policies by jurisdiction
+POLICIES = {
+    DEFAULT_POLICY['jurisdiction']: DEFAULT_POLICY,
+}
+
+
+def policy_id(policy: dict) -> str:
+    """Identifier stored with verdicts, e.g. 'il-default@1'"""
+    return f"{policy['name']}@{policy['version']}"
+
+
+def load_policy(path: str) -> dict:
+    """Load a policy from a JSON file, checking its rules are well formed"""
+    with open(path, encoding='utf-8') as f:
+        policy = json.load(f)
+
+    for key in ('name', 'version', 'site_types', 'default_site_type', 'levels'):
+        if key not in policy:
+            raise ValueError(f"Policy {path} is missing '{key}'")
+
+    rule_sets = [policy['levels']] + [site_type.get('levels', {}) for site_type in policy['site_types']]
+    for levels in rule_sets:
+        for rules in levels.values():
+            for rule in rules:
+                if rule['op'] not in OPERATORS:
+                    raise ValueError(f"Policy {path}: unknown operator '{rule['op']}' in rule {rule.get('name')}")
+
+    return policy
+
+
+def get_policy(jurisdiction: str = None) -> dict:
+    """Return the built-in policy for a jurisdiction (default: Israel)"""
+    if jurisdiction is None:
+        return DEFAULT_POLICY
+    if jurisdiction not in POLICIES:
+        raise ValueError(f"No scoring policy for jurisdiction '{jurisdiction}'")
+    return POLICIES[jurisdiction]
+
+
+def detect_site_type(policy: dict, url: str) -> dict:
+    """Return the first site type of the policy whose keywords match the URL"""
+    url_lower = url.lower()
+    for site_type in policy['site_types']:
+        if any(keyword in url_lower for keyword in site_type['keywords']):
+            return site_type
+    return policy['default_site_type']
+
+
+def level_rules(policy: dict, site_type: dict) -> dict:
+    """Rules per level, with the site type's overrides applied"""
+    levels = dict(policy['levels'])
+    levels.update(site_type.get('levels', {}))
+    return levels
+
+
+def compute_metric(metric: str, stats: dict, issue_counts: dict):
+    """Compute one rule metric for a single audit"""
+    if metric in PCT_METRICS:
+        count_key, total_key = PCT_METRICS[metric]
+        if stats[total_key] > 0:
+            return (stats[count_key] / stats[total_key]) * 100
+        return 0
+    if metric in ISSUE_COUNT_METRICS:
+        return issue_counts[ISSUE_COUNT_METRICS[metric]]
+    return stats[metric]
+
+
+def evaluate(policy: dict, url: str, stats: dict, issue_counts: dict) -> dict:
+    """Apply a policy to a single audit's stats and issue counts"""
+    site_type = detect_site_type(policy, url)
+    rules = level_rules(policy, site_type)
+
+    passes = {}
+    meets_lower = True
+    for level in LEVELS:
+        level_passes = all(
+            OPERATORS[rule['op']](compute_metric(rule['metric'], stats, issue_counts), rule['value'])
+            for rule in rules.get(level, [])
+        )
+        passes[level] = meets_lower and level_passes
+        meets_lower = passes[level]
+
+    if not passes['level_a']:
+        achieved_level = 'non_compliant'
+    else:
+        achieved_level = [level for level in LEVELS if passes[level]][-1]
+
+    return {
+        'achieved_level': achieved_level,
+        'passes': passes,
+        'site_type': site_type['site_type'],
+        'required_level': site_type['required_level'],
+        'reason': site_type['reason'],
+        'meets_required': LEVEL_HIERARCHY[achieved_level] >= LEVEL_HIERARCHY[site_type['required_level']],
+        'policy': policy_id(policy),
+    }
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows - only in-process coalescing is available
+    fcntl = None
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Followers read a result right after the leader releases the lock, so older
+# results (and idle lock files) are only taking up space
+RESULT_TTL = 300
+
+# Seconds between sweeps of the lock directory, per process
+PRUNE_INTERVAL = 60
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so equivalent audit requests share one key"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        # Malformed (e.g. port out of range) - the audit itself will fail to fetch it
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    # Drop default ports (https://site.com:443/ == https://site.com/)
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    path = parts.path or '/'
+
+    # The fragment never reaches the server, so it can't change the page
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+class _Call:
+    """A single in-flight execution shared by all waiting threads"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent executions of the same key into one.
+
+    Threads in the same process wait on the leader's result directly.
+    When a lock directory is available, the leader also holds a file lock
+    for the key, so workers in other processes (gunicorn) wait for it and
+    reuse the result it writes instead of running the audit again.
+    """
+
+    def __init__(self, lock_dir: str = None):
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), 'accessibility-agent-flights')
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._pruned_at = 0
+
+        if fcntl:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn):
+        """Run fn() once for all concurrent callers with the same key.
+
+        Returns a (result, shared) tuple, where shared is True when the
+        result came from another caller's execution.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._run_across_workers(key, fn)
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_across_workers(self, key, fn):
+        """Run fn() under a per-key file lock shared by all worker processes"""
+        if not fcntl:
+            return fn(), False
+
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+
+        arrived_at = time.time()
+        self._prune()
+
+        while True:
+            lock_file = open(lock_path, 'a')
+            # Blocks while another worker is running the same audit
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # The file may have been pruned while we waited - its lock no longer excludes anyone
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+        with lock_file:
+            try:
+                # A result written after we arrived belongs to a flight we joined
+                try:
+                    if os.path.getmtime(result_path) >= arrived_at:
+                        with open(result_path, encoding='utf-8') as f:
+                            result = json.load(f)
+                        # The leader failed - share its failure rather than running fn() again
+                        if isinstance(result, dict) and result.get('failed') is True:
+                            if result.get('error'):
+                                raise RuntimeError(result['error'])
+                            return None, True
+                        return result, True
+                except (OSError, ValueError):
+                    pass
+
+                try:
+                    result = fn()
+                except Exception as e:
+                    self._write_result(result_path, {'failed': True, 'error': str(e)})
+                    raise
+
+                self._write_result(result_path, {'failed': True} if result is None else result)
+                return result, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_result(self, result_path, result):
+        """Atomically replace the result file other workers read"""
+        tmp_path = f"{result_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, result_path)
+
+    def _prune(self):
+        """Remove results and idle lock files older than RESULT_TTL, at most every PRUNE_INTERVAL"""
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at < PRUNE_INTERVAL:
+                return
+            self._pruned_at = now
+
+        try:
+            names = os.listdir(self.lock_dir)
+        except OSError:
+            return
+
+        for name in names:
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if now - os.path.getmtime(path) < RESULT_TTL:
+                    continue
+
+                if not name.endswith('.lock'):
+                    os.remove(path)
+                    continue
+
+                # Only remove a lock file nobody holds; waiters re-check it (see _run_across_workers)
+                with open(path, 'a') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,78 @@
+"""Audit several pages of one site.
+
+Header, navigation, footer and other template regions shared by the pages
+are checked once and their findings reused, and the site report counts
+each template issue once instead of once per page.
+
+Usage:
+    python site_audit.py https://example.com/ https://example.com/about
+    python site_audit.py --urls-file pages.txt --output site-report.json
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from accessibility_agent import AccessibilityAgent
+from template_cache import TemplateCache, aggregate_site_issues
+
+
+def audit_site(urls, max_workers: int = 4, template_cache: TemplateCache = None, **agent_options):
+    """Audit pages of a site, returning per-page results and a site summary"""
+    template_cache = template_cache or TemplateCache()
+    session = AccessibilityAgent.create_session()
+
+    def audit_page(url):
+        agent = AccessibilityAgent(url, session=session, template_cache=template_cache, **agent_options)
+        if not agent.fetch_page():
+            return None
+        agent.run_checks()
+        agent.release_dom()
+        return agent.build_result()
+
+    if not urls:
+        return {'pages': [], 'site': aggregate_site_issues([])}
+
+    # The first page alone, so the others find the site's templates already checked
+    results = [audit_page(urls[0])]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results += list(executor.map(audit_page, urls[1:]))
+
+    results = [result for result in results if result]
+
+    return {
+        'pages': results,
+        'site': aggregate_site_issues(results)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Audit several pages of one site')
+    parser.add_argument('urls', nargs='*', help='Page URLs')
+    parser.add_argument('--urls-file', help='File with one page URL per line')
+    parser.add_argument('--workers', type=int, default=4, help='Pages audited in parallel')
+    parser.add_argument('--output', help='Write the full report as JSON to this file')
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file, encoding='utf-8') as f:
+            urls += [line.strip() for line in f if line.strip()]
+
+    if not urls:
+        parser.error('No URLs provided')
+
+    report = audit_site(urls, max_workers=args.workers)
+    site = report['site']
+
+    print("\n" + "="*60)
+    print(f"Audited {site['pages']} pages, {site['total_issues']} distinct issues "
+          f"({site['template_issues']} in shared template regions)")
+    for priority, issues in site['issues'].items():
+        for issue in issues:
+            where = f"template {issue['region']}" if issue.get('template') else 'page'
+            print(f"   [{priority}] {issue['type']} ({where}, {len(issue['pages'])} pages)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport written to {args.output}")
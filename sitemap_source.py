@@ -0,0 +1,274 @@
+"""Sitemap source for scheduling large-site audits.
+
+Discovers a site's sitemaps from robots.txt, streams nested sitemap indexes
+(gzipped or not) with constant memory, dedupes URLs in an on-disk set and
+emits the URLs that changed since the last run, most recently modified first.
+
+Usage:
+    python sitemap_source.py https://example.com --limit 100
+    python sitemap_source.py https://example.com --limit 20 --audit
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import itertools
+import re
+import sqlite3
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from lxml import etree
+
+from accessibility_agent import BROWSER_HEADERS
+
+
+DEFAULT_STATE_PATH = 'sitemap_state.db'
+
+# URLs written to the on-disk set per transaction
+INSERT_BATCH_SIZE = 10000
+
+
+def url_key(url: str) -> int:
+    """64-bit key of a URL - the on-disk set stores this as its rowid"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def parse_lastmod(value):
+    """Normalize a W3C datetime (2024-05-01, 2024-05-01T10:00:00+02:00) to UTC ISO format"""
+    if not value:
+        return None
+    # fromisoformat() before Python 3.11 rejects 'Z' and most fractional seconds
+    value = re.sub(r'\.\d+', '', value.strip()).replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class SitemapSource:
+    """URLs of one site from its sitemaps, deduped and filtered to what changed"""
+
+    def __init__(self, site_url: str, state_path: str = None, session: requests.Session = None,
+                 max_sitemaps: int = 10000):
+        parts = urlsplit(site_url if '://' in site_url else 'https://' + site_url)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.state_path = state_path or DEFAULT_STATE_PATH
+        self.session = session or requests.Session()
+        self.max_sitemaps = max_sitemaps
+        # Start of the current run; URLs emitted in it are stamped with this time
+        self.run_started_at = None
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    origin TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            # The deduping set: one row per URL, keyed by its 64-bit hash
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS urls (
+                    key INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    lastmod TEXT,
+                    first_seen_run INTEGER NOT NULL,
+                    seen_run INTEGER NOT NULL,
+                    emitted_at TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS urls_seen_run ON urls (seen_run, lastmod)')
+
+    def _connect(self):
+        return sqlite3.connect(self.state_path, timeout=30)
+
+    def discover(self):
+        """Sitemap URLs listed in robots.txt, or /sitemap.xml if there are none"""
+        sitemaps = []
+        try:
+            response = self.session.get(f"{self.origin}/robots.txt", timeout=10, headers=BROWSER_HEADERS)
+            if response.ok:
+                for line in response.text.splitlines():
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'sitemap' and value.strip():
+                        sitemaps.append(urljoin(self.origin, value.strip()))
+        except requests.RequestException as e:
+            print(f"Error loading robots.txt: {e}")
+
+        return sitemaps or [f"{self.origin}/sitemap.xml"]
+
+    def _open_sitemap(self, url):
+        """Stream a sitemap body, un-gzipping on the fly"""
+        response = self.session.get(url, timeout=30, headers=BROWSER_HEADERS, stream=True)
+        response.raise_for_status()
+        # Content-Encoding: gzip is undone by urllib3; .xml.gz files are gzipped content
+        response.raw.decode_content = True
+        # gzip still reads the trailer after the body ends - keep the stream open until then
+        response.raw.auto_close = False
+        stream = io.BufferedReader(response.raw, buffer_size=64 * 1024)
+        if stream.peek(2)[:2] == b'\x1f\x8b':
+            return response, gzip.GzipFile(fileobj=stream)
+        return response, stream
+
+    def _iter_sitemap(self, url):
+        """Yield ('url' | 'sitemap', loc, lastmod) for each entry of one sitemap file"""
+        response, stream = self._open_sitemap(url)
+        try:
+            # Only a handful of elements are in memory at once - each entry is
+            # cleared, along with its already processed siblings, once read
+            for _, element in etree.iterparse(stream, events=('end',), resolve_entities=False,
+                                              no_network=True, huge_tree=True):
+                kind = etree.QName(element).localname
+                if kind not in ('url', 'sitemap'):
+                    continue
+
+                loc = lastmod = None
+                for child in element:
+                    name = etree.QName(child).localname
+                    if name == 'loc':
+                        loc = (child.text or '').strip()
+                    elif name == 'lastmod':
+                        lastmod = parse_lastmod(child.text)
+
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+                if loc:
+                    yield kind, loc, lastmod
+        finally:
+            response.close()
+
+    def iter_entries(self):
+        """Yield (url, lastmod) for every page in the site's sitemaps, following indexes"""
+        pending = self.discover()
+        visited = set()
+
+        while pending and len(visited) < self.max_sitemaps:
+            sitemap_url = pending.pop()
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+
+            print(f"Reading sitemap: {sitemap_url}")
+            try:
+                for kind, loc, lastmod in self._iter_sitemap(sitemap_url):
+                    if kind == 'sitemap':
+                        pending.append(urljoin(sitemap_url, loc))
+                    else:
+                        yield loc, lastmod
+            except (requests.RequestException, etree.XMLSyntaxError, OSError, EOFError) as e:
+                print(f"Error reading sitemap {sitemap_url}: {e}")
+
+    def iter_changed_urls(self, mark_emitted: bool = True):
+        """Yield URLs never emitted or modified since they were, newest lastmod first.
+
+        All sitemaps are read into the on-disk set before the first URL is
+        emitted, so a URL listed in several sitemaps comes out once. Each URL
+        is recorded as emitted as it is yielded, so a run stopped early (e.g.
+        --limit) leaves the rest for the next run. With mark_emitted=False the
+        caller records them itself with record_emitted() once they are handled.
+        """
+        conn = self._connect()
+        try:
+            self.run_started_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+            with conn:
+                run_id = conn.execute('INSERT INTO runs (origin, started_at) VALUES (?, ?)',
+                                      (self.origin, self.run_started_at)).lastrowid
+
+            batch = []
+            total = 0
+            for url, lastmod in self.iter_entries():
+                batch.append((url_key(url), url, lastmod, run_id, run_id))
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    total += self._save_batch(conn, batch)
+                    batch = []
+            total += self._save_batch(conn, batch)
+            print(f"Read {total} sitemap entries")
+
+            # URLs still in the sitemaps that were never emitted, or whose lastmod moved past their emission
+            cursor = conn.execute(
+                '''SELECT key, url FROM urls
+                   WHERE seen_run = ? AND (emitted_at IS NULL OR lastmod > emitted_at)
+                   ORDER BY lastmod IS NULL, lastmod DESC''',
+                (run_id,)
+            )
+            # Emitted URLs are recorded through their own connection while this SELECT stays open
+            emitted = []
+            try:
+                while True:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    for key, url in rows:
+                        if mark_emitted:
+                            emitted.append(key)
+                        yield url
+                    self._mark_keys(emitted)
+                    emitted = []
+            finally:
+                # Also runs when the consumer stops early - what it was handed counts as emitted
+                self._mark_keys(emitted)
+
+            with conn:
+                conn.execute('UPDATE runs SET completed = 1 WHERE id = ?', (run_id,))
+        finally:
+            conn.close()
+
+    def record_emitted(self, urls):
+        """Record URLs from iter_changed_urls(mark_emitted=False) as handled"""
+        self._mark_keys([url_key(url) for url in urls])
+
+    def _mark_keys(self, keys):
+        if not keys:
+            return
+        with self._connect() as conn:
+            conn.executemany('UPDATE urls SET emitted_at = ? WHERE key = ?',
+                             [(self.run_started_at, key) for key in keys])
+
+    def _save_batch(self, conn, batch):
+        if not batch:
+            return 0
+        with conn:
+            conn.executemany(
+                '''INSERT INTO urls (key, url, lastmod, first_seen_run, seen_run) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       seen_run = excluded.seen_run,
+                       lastmod = CASE
+                           WHEN urls.lastmod IS NULL OR excluded.lastmod > urls.lastmod THEN excluded.lastmod
+                           ELSE urls.lastmod
+                       END''',
+                batch
+            )
+        return len(batch)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List the pages of a site that changed since the last run')
+    parser.add_argument('site', help='Site URL, e.g. https://example.com')
+    parser.add_argument('--state', help=f'State database path (default: {DEFAULT_STATE_PATH})')
+    parser.add_argument('--limit', type=int, help='Emit at most this many URLs')
+    parser.add_argument('--audit', action='store_true', help='Audit the emitted URLs instead of printing them')
+    args = parser.parse_args()
+
+    source = SitemapSource(args.site, args.state)
+    # Audited URLs only count as emitted once the audits have run
+    urls = source.iter_changed_urls(mark_emitted=not args.audit)
+    urls = list(itertools.islice(urls, args.limit) if args.limit else urls)
+
+    if args.audit:
+        from site_audit import audit_site
+
+        report = audit_site(urls)
+        source.record_emitted(urls)
+        print(f"\nAudited {report['site']['pages']} pages, {report['site']['total_issues']} distinct issues")
+    else:
+        for url in urls:
+            print(url)
@@ -8,6 +8,10 @@ const errorMessage = document.getElementById('errorMessage');
 const errorText = document.getElementById('errorText');
 const successMessage = document.getElementById('successMessage');
 const issuesList = document.getElementById('issuesList');
+const partialMessage = document.getElementById('partialMessage');
+
+// Downloads name their audit - the server may run several workers
+let currentAuditId = null;
 
 const priorityNames = {
     'critical': 'קריטי',
@@ -76,6 +80,7 @@ function hideResults() {
 
 function displayResults(data) {
     const { url, issues, total_issues, wcag_level } = data;
+    currentAuditId = data.audit_id;
 
     // Update tested URL
     const testedUrlElement = document.getElementById('testedUrl');
@@ -91,10 +96,19 @@ function displayResults(data) {
     document.getElementById('highCount').textContent = issues.high.length;
     document.getElementById('mediumCount').textContent = issues.medium.length;
 
+    // Audits cut short (e.g. over the memory budget) have no verdict and an incomplete issue list
+    if (data.partial) {
+        document.getElementById('partialText').textContent =
+            `בדיקה חלקית: הבדיקה הופסקה אחרי ${data.memory.aborted_at}, ולכן חלק מהבדיקות לא רצו והתוצאות אינן מלאות`;
+        partialMessage.classList.remove('hidden');
+    } else {
+        partialMessage.classList.add('hidden');
+    }
+
     // Clear previous issues
     issuesList.innerHTML = '';
 
-    if (total_issues === 0) {
+    if (total_issues === 0 && !data.partial) {
         successMessage.classList.remove('hidden');
         issuesList.classList.add('hidden');
     } else {
@@ -135,7 +149,7 @@ function displayWCAGLevel(wcagLevel) {
     // Update achieved level indicator
     const achievedIndicator = document.getElementById('achievedLevelCompact');
     achievedIndicator.textContent = wcagLevel.achieved_label;
-    achievedIndicator.classList.remove('level_aaa', 'level_aa', 'level_a', 'non_compliant');
+    achievedIndicator.classList.remove('level_aaa', 'level_aa', 'level_a', 'non_compliant', 'incomplete');
     achievedIndicator.classList.add(wcagLevel.achieved_level);
 
     // Update quick status grid
@@ -147,12 +161,15 @@ function displayWCAGLevel(wcagLevel) {
 function updateQuickStatus(elementId, passes) {
     const element = document.getElementById(elementId);
     element.classList.remove('passed', 'failed');
-    element.classList.add(passes ? 'passed' : 'failed');
+    // null when the audit was incomplete - neither passed nor failed
+    if (passes !== null) {
+        element.classList.add(passes ? 'passed' : 'failed');
+    }
 }
 
 // Download function
 function downloadPDF() {
-    window.location.href = '/download-report';
+    window.location.href = `/download-report?audit_id=${currentAuditId}`;
 }
 
 
@@ -190,6 +207,14 @@ function createIssueCard(issue, priority) {
         card.appendChild(countBadge);
     }
 
+    // Issues found inside an embedded frame
+    if (issue.frame) {
+        const frameInfo = document.createElement('div');
+        frameInfo.className = 'issue-count';
+        frameInfo.textContent = `בתוך iframe: ${issue.frame}`;
+        card.appendChild(frameInfo);
+    }
+
     // Add fix recommendation
     const recommendation = getFixRecommendation(issue.type);
     if (recommendation) {
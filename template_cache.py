@@ -0,0 +1,157 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from bs4 import Comment, NavigableString, Tag
+
+
+# Landmark regions that sites repeat on every page
+TEMPLATE_TAGS = ['header', 'nav', 'footer', 'aside']
+TEMPLATE_ROLES = ['banner', 'navigation', 'contentinfo', 'complementary']
+
+# Attributes the element checks look at - two regions that agree on these
+# (and on their text) produce the same findings
+FINGERPRINT_ATTRS = ['alt', 'aria-label', 'aria-labelledby', 'aria-hidden', 'role', 'href', 'src',
+                     'type', 'id', 'for', 'value', 'scope', 'headers', 'title']
+
+PRIORITIES = ['critical', 'high', 'medium', 'low']
+
+# Wording of the element checks' issues, rebuilt when template findings change their counts
+ISSUE_DETAILS = {
+    'Missing alt text': 'Found {count} images without alt text',
+    'Decorative images without empty alt': 'Found {count} decorative images (tracking pixels, spacers) without alt=""',
+    'Unclear links': 'Found {count} links without clear text',
+    'Form inputs without labels': 'Found {count} form inputs without accessible labels',
+    'Buttons without accessible text': 'Found {count} buttons without accessible text',
+    'Tables without headers': 'Found {count} tables without proper headers',
+}
+
+# Issues whose details also give the number of elements checked, and the stat holding it
+ISSUE_TOTAL_STATS = {'Missing alt text': 'total_images'}
+
+
+def find_template_regions(soup):
+    """Outermost landmark regions outside the main content"""
+    regions = []
+    region_ids = set()
+
+    candidates = soup.find_all(lambda tag: tag.name in TEMPLATE_TAGS or tag.get('role') in TEMPLATE_ROLES)
+    for region in candidates:
+        parents = list(region.parents)
+        # Nested inside a region we already have - it goes with its parent
+        if any(id(parent) in region_ids for parent in parents):
+            continue
+        # An <article>'s header or a sidebar inside <main> is page content
+        if any(parent.name in ('main', 'article') or parent.get('role') == 'main'
+               for parent in parents if isinstance(parent, Tag)):
+            continue
+        regions.append(region)
+        region_ids.add(id(region))
+
+    return regions
+
+
+def fingerprint(region, extra=()) -> str:
+    """Hash of a region's normalized structure, attributes and text.
+
+    extra holds strings about the region's page context that change its
+    findings (e.g. which of its inputs are labelled from outside it).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in extra:
+        digest.update(f'[{value}]'.encode('utf-8'))
+
+    for node in [region] + list(region.descendants):
+        if isinstance(node, Tag):
+            attrs = ' '.join(f'{name}={node.get(name)}' for name in FINGERPRINT_ATTRS if node.get(name) is not None)
+            digest.update(f'<{node.name} {attrs}>'.encode('utf-8'))
+        elif isinstance(node, NavigableString) and not isinstance(node, Comment):
+            # Collapse whitespace and digits so "Cart (3)" matches "Cart (4)"
+            text = re.sub(r'\d+', '0', ' '.join(node.split()))
+            if text:
+                digest.update(text.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def region_name(region) -> str:
+    return region.get('role') or region.name
+
+
+class TemplateCache:
+    """Findings of template regions (header, nav, footer...), per site.
+
+    The first page of a site that contains a region checks it and stores
+    the findings under the region's fingerprint; later pages reuse them.
+    """
+
+    def __init__(self, max_sites: int = 1000):
+        self.max_sites = max_sites
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, site: str, region_fingerprint: str):
+        with self._lock:
+            templates = self._sites.get(site)
+            if templates is None:
+                return None
+            self._sites.move_to_end(site)
+            return templates.get(region_fingerprint)
+
+    def put(self, site: str, region_fingerprint: str, findings: dict):
+        with self._lock:
+            self._sites.setdefault(site, {})[region_fingerprint] = findings
+            self._sites.move_to_end(site)
+            if len(self._sites) > self.max_sites:
+                self._sites.popitem(last=False)
+
+
+def issue_details(issue: dict, count: int, total: int = None) -> str:
+    """Details of an element issue for a new count (and total, where the wording has one)"""
+    if issue['type'] not in ISSUE_DETAILS:
+        return issue['details']
+    details = ISSUE_DETAILS[issue['type']].format(count=count)
+    if total is not None and issue['type'] in ISSUE_TOTAL_STATS:
+        details += f" out of {total} total"
+    return details
+
+
+def aggregate_site_issues(results):
+    """Site-level issue summary counting each template issue once.
+
+    Page issues are listed per page; issues of a template region shared by
+    several pages (the 'templates' of a page issue) are listed once with the
+    pages they appear on.
+    """
+    issues = {priority: [] for priority in PRIORITIES}
+    templates = {}
+
+    for result in results:
+        for priority in PRIORITIES:
+            for issue in result['issues'][priority]:
+                page_issue = {key: value for key, value in issue.items() if key != 'templates'}
+                template_count = 0
+
+                for template in issue.get('templates', []):
+                    template_count += template.get('count', 0)
+                    key = (template['template'], issue['type'])
+                    if key not in templates:
+                        templates[key] = {'type': issue['type'], **template, 'pages': []}
+                        issues[priority].append(templates[key])
+                    templates[key]['pages'].append(result['url'])
+
+                # What's left after the template regions was found in the page itself
+                if 'templates' in issue:
+                    page_issue['count'] = issue['count'] - template_count
+                    if not page_issue['count']:
+                        continue
+                    page_issue['details'] = issue_details(issue, page_issue['count'])
+                issues[priority].append({**page_issue, 'pages': [result['url']]})
+
+    return {
+        'pages': len(results),
+        'issues': issues,
+        'total_issues': sum(len(priority_issues) for priority_issues in issues.values()),
+        'template_issues': len(templates),
+    }
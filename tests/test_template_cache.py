@@ -0,0 +1,40 @@
+from bs4 import BeautifulSoup
+
+from accessibility_agent import AccessibilityAgent
+from template_cache import TemplateCache
+
+
+PAGE = """<html lang="en"><body>
+<header><a href="/">click here</a><img src="logo.png"><input id="q" type="search"><input id="n" type="text"></header>
+<nav><a href="/about">About</a></nav>
+<main><h1>{title}</h1><label for="q">Search</label><a href="/more">read more</a><img src="{image}"><table><tr><td>1</td></tr></table></main>
+<footer><button></button><table><tr><td>2</td></tr></table></footer>
+</body></html>"""
+
+
+def audit(html, template_cache=None):
+    agent = AccessibilityAgent('https://example.com/', template_cache=template_cache)
+    agent.soup = BeautifulSoup(html, 'lxml')
+    agent.run_checks()
+    return agent.build_result()
+
+
+def summary(result):
+    issues = {priority: sorted((issue['type'], issue.get('count'), issue['details']) for issue in issues)
+              for priority, issues in result['issues'].items()}
+    stats = {key: value for key, value in result['stats'].items() if not key.startswith('template_regions')}
+    return issues, result['total_issues'], stats, result['wcag_level']['achieved_level']
+
+
+def test_template_mode_matches_plain_audit():
+    cache = TemplateCache()
+    for title, image in [('Home', 'a.png'), ('Other', 'b.png')]:
+        html = PAGE.format(title=title, image=image)
+        assert summary(audit(html, cache)) == summary(audit(html))
+
+
+def test_input_labelled_outside_its_region():
+    result = audit(PAGE.format(title='Home', image='a.png'), TemplateCache())
+    labels = [issue for issue in result['issues']['high'] if issue['type'] == 'Form inputs without labels']
+    # Only #n is unlabelled; #q's label is in <main>
+    assert [issue['count'] for issue in labels] == [1]